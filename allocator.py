@@ -0,0 +1,141 @@
+from instruction_table import InstructionTable, JUMPS, PAIR_OPS
+from symbol_table import SymbolTable
+from vm import MEMORY_BASE
+
+
+class AddressAllocator:
+    """
+    Liveness-based memory allocation over the PUSHM/POPM code in an
+    InstructionTable.
+    - liveness: backward dataflow over the instruction-level control flow
+      graph, one bit per memory address
+    - interference: a POPM interferes with every address live after it,
+      and addresses read before any write (which rely on memory starting
+      at 0) all interfere with each other
+    - allocation: greedy colouring in order of first use, so variables
+      whose lifetimes never overlap share one slot from MEMORY_BASE up
+    Addresses that the code never touches get no slot of their own and are
+    listed at MEMORY_BASE.
+    self.report holds before/after memory cells, saved and unused counts.
+    """
+    def __init__(self):
+        self.report = {}
+
+    def allocate(self, instruction_table, symbol_table):
+        """Return a new (InstructionTable, SymbolTable) using the compacted addresses"""
+        code = [(op, operand) for address, op, operand in instruction_table.rows()]
+        if any(op in PAIR_OPS for op, operand in code):
+            raise Exception("Error: Allocate memory before fusing superinstructions")
+        symbols = list(symbol_table.symbols())
+
+        # Bit index per memory address, in order of first use
+        bits = {}
+        for op, operand in code:
+            if op in ('PUSHM', 'POPM') and operand not in bits:
+                bits[operand] = len(bits)
+
+        slots = self.color(self.interference(code, bits), len(bits))
+        mapping = {address: MEMORY_BASE + slots[bit] for address, bit in bits.items()}
+
+        table = InstructionTable(instruction_table.compact)
+        for op, operand in code:
+            if op in ('PUSHM', 'POPM'):
+                operand = mapping[operand]
+            table.gen_instr(op, operand)
+
+        declared = {info['memory_address'] for identifier, info in symbols}
+        allocated = [(identifier, dict(info, memory_address=mapping.get(info['memory_address'], MEMORY_BASE)))
+                     for identifier, info in symbols]
+        used = len(set(slots))
+        new_symbol_table = SymbolTable.from_symbols(allocated, MEMORY_BASE + used)
+
+        before = len(declared | set(bits))
+        self.report = {
+            'before': before,
+            'after': used,
+            'saved': before - used,
+            'unused': len(declared - set(bits)),
+        }
+        return table, new_symbol_table
+
+    def successors(self, code, i):
+        op, operand = code[i]
+        if op in JUMPS and operand is not None:
+            if op == 'JUMP':
+                return (operand - 1,)
+            return (operand - 1, i + 1)
+        return (i + 1,)
+
+    def liveness(self, code, bits):
+        """live_out bitmask per instruction (a fixed point of the dataflow equations)"""
+        count = len(code)
+        use = [0] * count
+        define = [0] * count
+        preds = [[] for _ in range(count)]
+        for i, (op, operand) in enumerate(code):
+            if op == 'PUSHM':
+                use[i] = 1 << bits[operand]
+            elif op == 'POPM':
+                define[i] = 1 << bits[operand]
+            for succ in self.successors(code, i):
+                if 0 <= succ < count:
+                    preds[succ].append(i)
+
+        live_in = [0] * count
+        live_out = [0] * count
+        work = list(range(count))
+        pending = [True] * count
+        while work:
+            i = work.pop()
+            pending[i] = False
+            out = 0
+            for succ in self.successors(code, i):
+                if 0 <= succ < count:
+                    out |= live_in[succ]
+            live_out[i] = out
+            new_in = use[i] | (out & ~define[i])
+            if new_in != live_in[i]:
+                live_in[i] = new_in
+                for pred in preds[i]:
+                    if not pending[pred]:
+                        pending[pred] = True
+                        work.append(pred)
+        return live_in, live_out
+
+    def interference(self, code, bits):
+        """Interference bitmask per address bit"""
+        edges = [0] * len(bits)
+        if not code:
+            return edges
+        live_in, live_out = self.liveness(code, bits)
+
+        for i, (op, operand) in enumerate(code):
+            if op == 'POPM':
+                bit = bits[operand]
+                others = live_out[i] & ~(1 << bit)
+                edges[bit] |= others
+                for other in self.members(others):
+                    edges[other] |= 1 << bit
+
+        # Read-before-write addresses all hold their initial 0 at once
+        entry = live_in[0]
+        for bit in self.members(entry):
+            edges[bit] |= entry & ~(1 << bit)
+        return edges
+
+    def members(self, mask):
+        while mask:
+            low = mask & -mask
+            yield low.bit_length() - 1
+            mask ^= low
+
+    def color(self, edges, count):
+        """Lowest free slot per address bit, in bit (first use) order"""
+        slots = []
+        for bit in range(count):
+            taken = {slots[other] for other in self.members(edges[bit]) if other < bit}
+            slot = 0
+            while slot in taken:
+                slot += 1
+            slots.append(slot)
+        return slots
@@ -0,0 +1,551 @@
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from incremental import IncrementalCompiler
+from instruction_table import InstructionTable
+from lexer import LexicalAnalyzer
+from ll1 import LL1Analyzer
+from syntax import SyntaxAnalyzer, TRACE_OFF, TRACE_FULL
+
+
+class ProgramGenerator:
+    """
+    Seeded generator of valid Rat25F programs.
+    - declarations: number of declared identifiers (integer and boolean)
+    - statements: number of top-level statements
+    - depth: maximum nesting depth of while/if blocks
+    - expression_length: number of operands per arithmetic expression
+    The same arguments always produce the same program.
+    """
+    def __init__(self, seed=0, declarations=50, statements=1000, depth=3, expression_length=4):
+        self.random = random.Random(seed)
+        self.declarations = max(2, declarations)
+        self.statements = statements
+        self.depth = depth
+        self.expression_length = max(1, expression_length)
+        count = self.declarations
+        self.integers = [f"n{i}" for i in range(count - count // 4)]
+        self.booleans = [f"b{i}" for i in range(count // 4)]
+
+    def generate(self):
+        out = ['"generated program"\n', "#\n"]
+        for qualifier, names in (("integer", self.integers), ("boolean", self.booleans)):
+            for start in range(0, len(names), 10):
+                out.append(f"{qualifier} {', '.join(names[start:start + 10])};\n")
+        for i in range(self.statements):
+            if i % 50 == 0:
+                out.append(f'"statement {i}"\n')
+            self.statement(out, self.depth, "")
+        out.append("#\n")
+        return "".join(out)
+
+    def expression(self):
+        rnd = self.random
+        parts = []
+        for i in range(rnd.randint(1, self.expression_length)):
+            if i:
+                parts.append(rnd.choice(["+", "-", "*", "/"]))
+            choice = rnd.random()
+            if choice < 0.5:
+                operand = rnd.choice(self.integers)
+            elif choice < 0.8:
+                operand = str(rnd.randint(1, 999))
+            elif choice < 0.9:
+                operand = f"-{rnd.choice(self.integers)}"
+            else:
+                operand = f"({rnd.choice(self.integers)} + {rnd.randint(1, 9)})"
+            parts.append(operand)
+        return " ".join(parts)
+
+    def condition(self):
+        relop = self.random.choice(["==", "!=", ">", "<", "<=", ">="])
+        return f"{self.expression()} {relop} {self.expression()}"
+
+    def statement(self, out, depth, indent):
+        rnd = self.random
+        kind = rnd.random()
+        if depth > 0 and kind < 0.15:
+            out.append(f"{indent}while ({self.condition()}) {{\n")
+            for _ in range(rnd.randint(1, 3)):
+                self.statement(out, depth - 1, indent + "    ")
+            out.append(f"{indent}}}\n")
+        elif depth > 0 and kind < 0.3:
+            out.append(f"{indent}if ({self.condition()}) {{\n")
+            for _ in range(rnd.randint(1, 3)):
+                self.statement(out, depth - 1, indent + "    ")
+            out.append(f"{indent}}}\n")
+            if rnd.random() < 0.5:
+                out.append(f"{indent}else\n")
+                self.statement(out, depth - 1, indent + "    ")
+            out.append(f"{indent}fi\n")
+        elif kind < 0.4:
+            out.append(f"{indent}put({self.expression()});\n")
+        elif kind < 0.45:
+            out.append(f"{indent}get({rnd.choice(self.integers)});\n")
+        elif kind < 0.5 and self.booleans:
+            out.append(f"{indent}{rnd.choice(self.booleans)} = {rnd.choice(['true', 'false'])};\n")
+        else:
+            out.append(f"{indent}{rnd.choice(self.integers)} = {self.expression()};\n")
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_phases(source, trace=TRACE_OFF, compact=False):
+    """
+    Time each compiler phase separately on one source text:
+    comment strip (legacy lex_comment pre-pass), lex, parse + codegen,
+    and output formatting. Returns a dict of timings and throughput.
+    """
+    l_analyzer = LexicalAnalyzer()
+    stripped, strip_time = timed(l_analyzer.lex_comment, source)
+    tokens, lex_time = timed(lambda: list(l_analyzer.tokens(source)))
+
+    s_analyzer = SyntaxAnalyzer(tokens, trace, io.StringIO() if trace != TRACE_OFF else None, compact)
+    (success, output), parse_time = timed(s_analyzer.parse)
+    if not success:
+        raise Exception(f"Error: generated program failed to compile: {output[0]}")
+
+    def write_output():
+        f = io.StringIO()
+        s_analyzer.instruction_table.write_instructions(f)
+        s_analyzer.symbol_table.write_table(f)
+        return f.tell()
+
+    output_size, output_time = timed(write_output)
+    instructions = len(s_analyzer.instruction_table)
+    return {
+        "source_bytes": len(source),
+        "tokens": len(tokens),
+        "instructions": instructions,
+        "output_chars": output_size,
+        "seconds": {
+            "comment_strip": round(strip_time, 4),
+            "lex": round(lex_time, 4),
+            "parse_codegen": round(parse_time, 4),
+            "output": round(output_time, 4),
+        },
+        "tokens_per_sec": round(len(tokens) / lex_time) if lex_time else None,
+        "instructions_per_sec": round(instructions / parse_time) if parse_time else None,
+    }
+
+
+def bench_parse(source, repeat=5):
+    """
+    Parse-only benchmark: SyntaxAnalyzer over pre-lexed tokens with no
+    trace, best of repeat runs. Returns seconds and tokens per second.
+    """
+    tokens = list(LexicalAnalyzer().tokens(source))
+    best = None
+    for _ in range(repeat):
+        (success, output), seconds = timed(SyntaxAnalyzer(tokens, TRACE_OFF).parse)
+        if not success:
+            raise Exception(f"Error: generated program failed to compile: {output[0]}")
+        best = seconds if best is None else min(best, seconds)
+    return {
+        "tokens": len(tokens),
+        "seconds": round(best, 4),
+        "tokens_per_sec": round(len(tokens) / best) if best else None,
+    }
+
+
+def bench_parsers(source, repeat=3):
+    """
+    Parse-only throughput of the recursive descent SyntaxAnalyzer and the
+    table-driven LL1Analyzer on the same pre-lexed tokens (no trace).
+    Best of repeat runs each; both must generate the same code.
+    """
+    tokens = list(LexicalAnalyzer().tokens(source))
+    results = {"tokens": len(tokens)}
+    listings = {}
+    for name, analyzer in (("recursive_descent", SyntaxAnalyzer), ("ll1_table", LL1Analyzer)):
+        best = None
+        for _ in range(repeat):
+            parser = analyzer(tokens, TRACE_OFF)
+            (success, output), seconds = timed(parser.parse)
+            if not success:
+                raise Exception(f"Error: generated program failed to compile: {output[0]}")
+            best = seconds if best is None else min(best, seconds)
+        listings[name] = parser.instruction_table.print_instructions()
+        results[name] = {
+            "seconds": round(best, 4),
+            "tokens_per_sec": round(len(tokens) / best) if best else None,
+        }
+    if listings["recursive_descent"] != listings["ll1_table"]:
+        raise Exception("Error: parsers generated different code")
+    rd, ll1 = results["recursive_descent"]["seconds"], results["ll1_table"]["seconds"]
+    results["ll1_speedup"] = round(rd / ll1, 2) if ll1 else None
+    return results
+
+
+def instruction_memory(count, compact):
+    """
+    Build a count-instruction table in the given layout, back-patching every
+    JUMPZ the way while/if statements do.
+    Returns traced bytes held by the table, the peak during the build and
+    the build time.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    table = InstructionTable(compact)
+    pending = []
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:
+            table.gen_instr("PUSHM", 10000 + i % 64)
+        elif kind == 1:
+            table.gen_instr("PUSHI", i)
+        elif kind == 2:
+            table.gen_instr("LES", None)
+        else:
+            pending.append(table.gen_instr("JUMPZ", None))
+    for address in pending:
+        table.update_instruction(address, table.instr_address)
+    elapsed = time.perf_counter() - start
+    del pending
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del table
+    return {"bytes": size, "peak_bytes": peak, "seconds": round(elapsed, 4)}
+
+
+def token_memory(source, store):
+    """
+    Lex source into a list of (token_type, lexeme) tuples or a TokenStore.
+    Returns the tokens, traced bytes held by them and the lex time.
+    """
+    l_analyzer = LexicalAnalyzer()
+    tracemalloc.start()
+    start = time.perf_counter()
+    tokens = l_analyzer.store(source) if store else list(l_analyzer.tokens(source))
+    elapsed = time.perf_counter() - start
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return tokens, {"bytes": size, "seconds": round(elapsed, 4)}
+
+
+def bench_tokens(source, repeat=3):
+    """
+    Compare tuple tokens with the TokenStore: bytes per token, and parse
+    time (best of repeat) when SyntaxAnalyzer reads each representation.
+    """
+    results = {}
+    for name, store in (("tuples", False), ("store", True)):
+        tokens, memory = token_memory(source, store)
+        best = None
+        for _ in range(repeat):
+            (success, output), seconds = timed(SyntaxAnalyzer(tokens, TRACE_OFF).parse)
+            if not success:
+                raise Exception(f"Error: generated program failed to compile: {output[0]}")
+            best = seconds if best is None else min(best, seconds)
+        results[name] = dict(memory, bytes_per_token=round(memory["bytes"] / len(tokens), 1),
+                             parse_seconds=round(best, 4))
+        results["tokens"] = len(tokens)
+    return results
+
+
+def bench_instruction_memory(count=1_000_000):
+    """Compare the dict-per-instruction and compact array layouts"""
+    dict_layout = instruction_memory(count, compact=False)
+    compact_layout = instruction_memory(count, compact=True)
+    return {
+        "instructions": count,
+        "dict": dict_layout,
+        "compact": compact_layout,
+        "bytes_per_instruction": {
+            "dict": round(dict_layout["bytes"] / count, 1),
+            "compact": round(compact_layout["bytes"] / count, 1),
+        },
+    }
+
+
+# Characters for random lexer inputs: ASCII, operators and separators, ASCII
+# control characters, and non-ASCII letters, decimal digits, other numeric
+# characters and spaces
+LEXER_ALPHABET = ("abcxyzABCXYZ0123456789 \t\n+-*/%=<>!|&(){}[],;:.#$_@?\x1c\x1f"
+                  "éßÅж٣٤²³½①Ⅻ\xa0\u2003")
+
+
+def fsm_tokens(l_analyzer, text):
+    """
+    Tokens from the per-token FSM loop that scan() replaced (text must be
+    comment-free). No token spans a newline, so lines are lexed one at a
+    time; the FSMs lowercase all of the text they are given per identifier.
+    """
+    tokens = []
+    for line in text.split("\n"):
+        index = 0
+        while index < len(line):
+            if line[index].isspace():
+                index += 1
+                continue
+            token_type, lexeme, index = l_analyzer.lexer(line, index)
+            if token_type:
+                tokens.append((token_type, lexeme))
+    return tokens
+
+
+def check_lexer(sources):
+    """
+    Check that scan() yields exactly the FSM loop's tokens for each of
+    sources, a list of (name, text), both on the text and on its UTF-8
+    bytes (as --mmap lexes it); comments are stripped first, as the FSM
+    loop requires. Returns token and mismatch counts, plus the first
+    mismatch per failing source.
+    """
+    l_analyzer = LexicalAnalyzer()
+    tokens = 0
+    mismatches = []
+    for name, text in sources:
+        text = l_analyzer.lex_comment(text)
+        expected = fsm_tokens(l_analyzer, text)
+        tokens += len(expected)
+        for kind, source in (("scan", text), ("scan bytes", text.encode())):
+            actual = list(l_analyzer.scan(source))
+            if actual != expected:
+                index = next((i for i, pair in enumerate(zip(actual, expected)) if pair[0] != pair[1]),
+                             min(len(actual), len(expected)))
+                mismatches.append({"source": name, "token": index,
+                                   kind: actual[index:index + 3], "fsm": expected[index:index + 3]})
+                break
+    return {"sources": len(sources), "tokens": tokens, "mismatches": mismatches}
+
+
+# Sources for check_mmap(): ones that fail to parse stop the scanner partway,
+# and non-ASCII letters, digits and spaces or ASCII control characters must
+# lex as they do without --mmap
+MMAP_SOURCES = (
+    ("valid", "#\ninteger a;\na = 1;\nput(a);\n#\n"),
+    ("syntax error", "#\ninteger a;\na = ;\n#\n"),
+    ("missing #", "#\ninteger a;\na = 1;\n"),
+    ("empty", ""),
+    ("no-break space", "#\ninteger a, b;\na\xa0b = 1;\n#\n"),
+    ("em space", "#\ninteger ab, cd;\nab\u2003cd = 1;\n#\n"),
+    ("non-ASCII digit", "#\ninteger a;\na = \u06634;\n#\n"),
+    ("non-ASCII identifier", "#\ninteger \xe9t\xe9;\n\xe9t\xe9 = 1;\nput(\xc9T\xc9);\n#\n"),
+    ("curly quote comment", "#\ninteger a;\n\u201ccomment\u201c\na = 1;\n#\n"),
+    ("control characters", "#\ninteger a,\x1cb;\x1da = 1;\x1eb = 2\x1f;\n#\n"),
+)
+
+
+def check_mmap(sources=MMAP_SOURCES):
+    """
+    Check that compile_file gives the same result and output with --mmap
+    as without, and never lets an exception escape, for each of sources, a
+    list of (name, text). Returns source and mismatch counts.
+    """
+    from main import compile_file
+
+    mismatches = []
+    with tempfile.TemporaryDirectory() as directory:
+        for index, (name, text) in enumerate(sources):
+            path = os.path.join(directory, f"t{index}.txt")
+            with open(path, "w") as f:
+                f.write(text)
+            results = []
+            for use_mmap in (False, True):
+                output_file = os.path.join(directory, f"o{index}_{int(use_mmap)}.txt")
+                try:
+                    success, messages, cache_status = compile_file(path, output_file, TRACE_OFF, use_mmap=use_mmap)
+                    with open(output_file) as f:
+                        results.append((success, f.read()))
+                except Exception as e:
+                    results.append((None, f"{type(e).__name__}: {e}"))
+            if results[0] != results[1]:
+                mismatches.append({"source": name, "read": results[0], "mmap": results[1]})
+    return {"sources": len(sources), "mismatches": mismatches}
+
+
+# Sources for check_recovery(), with the token position of each error that
+# one recovering parse must report
+RECOVERY_SOURCES = (
+    ("missing ; after declaration", "#\ninteger a\nboolean b;\na = 1;\nb = x;\n#\n", [3, 12]),
+    ("stray }", "#\ninteger a;\na = 1;\n}\nput(y);\n#\n", [8, 11]),
+    ("consecutive stray }", "# integer a; } } } } a = x; #", [4, 5, 6, 7, 10]),
+    ("consecutive stray fi", "# a = 1; fi fi fi a = 2; #", [1, 5, 6, 7, 8]),
+)
+
+
+def check_recovery(sources=RECOVERY_SOURCES):
+    """
+    Check that a recovering parse reports exactly the expected errors for
+    each of sources, a list of (name, text, token positions). Returns
+    source and mismatch counts.
+    """
+    mismatches = []
+    for name, text, expected in sources:
+        s_analyzer = SyntaxAnalyzer(LexicalAnalyzer().tokens(text), TRACE_OFF, recover=True)
+        success, messages = s_analyzer.parse()
+        positions = [int(message.rsplit(" ", 1)[-1]) for message in messages] if not success else []
+        if positions != expected:
+            mismatches.append({"source": name, "expected": expected, "messages": messages})
+    return {"sources": len(sources), "mismatches": mismatches}
+
+
+# Replacement texts for check_incremental()
+EDIT_SNIPPETS = ("n1 = n2 + 3;", "put(n0);", "get(n3);", "while (n1 < 3) { n1 = n1 + 1; }",
+                 "if (n0 > 1) put(1); else put(2); fi", "x", "7", "-", "(", ";", "}", '"c"',
+                 " ", "\n", "integer q;", "")
+
+
+def random_edit(rng, compiler):
+    """
+    A random (start, end, text) edit of compiler.source: inside one
+    statement, spanning several, or starting or ending in the whitespace
+    between two statements. Half of the edits keep the replaced text and
+    add a snippet before or after it.
+    """
+    source = compiler.source
+    kind = rng.random()
+    if kind < 0.4 or len(compiler.statements) < 2:
+        start = rng.randrange(len(source))
+        end = min(len(source), start + rng.randint(0, 12))
+    else:
+        k = rng.randrange(len(compiler.statements) - 1)
+        gap_start = compiler.span(compiler.statements[k])[1]
+        gap_end = compiler.span(compiler.statements[k + 1])[0]
+        point = rng.randint(gap_start, gap_end)
+        if kind < 0.7:
+            start, end = point, min(len(source), point + rng.randint(0, 12))
+        else:
+            start, end = max(0, point - rng.randint(0, 12)), point
+    text = rng.choice(EDIT_SNIPPETS)
+    if rng.random() < 0.5:
+        text = text + source[start:end] if rng.random() < 0.5 else source[start:end] + text
+    return start, end, text
+
+
+def check_incremental(seed=0, programs=40, edits=30):
+    """
+    Check IncrementalCompiler.edit() against fresh full compiles of the
+    edited source: same success, same code and tokens that match the
+    source. Runs edits random edits (seeded) on each of programs
+    generated programs, in both InstructionTable layouts; after a
+    failed edit the program is compiled again from scratch.
+    """
+    rng = random.Random(seed)
+    l_analyzer = LexicalAnalyzer()
+    count = 0
+    mismatches = []
+    for compact in (False, True):
+        for index in range(programs):
+            # Widen the gaps between statements for edits to start and end in
+            source = ProgramGenerator(seed + index, 8, 15, 2, 3).generate().replace("\n", "  \n ")
+            compiler = IncrementalCompiler(compact)
+            compiler.compile(source)
+            for _ in range(edits):
+                start, end, text = random_edit(rng, compiler)
+                before = compiler.source
+                success, messages = compiler.edit(start, end, text)
+                s_analyzer = SyntaxAnalyzer(l_analyzer.tokens(compiler.source), TRACE_OFF, compact=compact)
+                expected, output = s_analyzer.parse()
+                count += 1
+                if (success != expected
+                        or success and (list(compiler.instruction_table.rows())
+                                        != list(s_analyzer.instruction_table.rows())
+                                        or [token[:2] for token in compiler.tokens]
+                                        != list(l_analyzer.scan(compiler.source)))):
+                    mismatches.append({"source": before, "edit": [start, end, text],
+                                       "incremental": success, "full": expected})
+                if not success:
+                    compiler.compile(source)
+    return {"edits": count, "mismatches": mismatches}
+
+
+def run_checks(source, seed=0, samples=2000):
+    """
+    Correctness checks behind --check: lexer parity on t1-t3, the
+    generated program and samples random inputs (seeded), --mmap
+    compiles of valid and invalid sources, error recovery and incremental
+    edits.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    sources = []
+    for name in ("t1.txt", "t2.txt", "t3.txt"):
+        path = os.path.join(here, name)
+        if os.path.exists(path):
+            with open(path) as f:
+                sources.append((name, f.read()))
+    sources.append(("generated", source))
+    rng = random.Random(seed)
+    for i in range(samples):
+        sources.append((f"random {i}", "".join(rng.choices(LEXER_ALPHABET, k=rng.randint(1, 200)))))
+    return {"lexer": check_lexer(sources), "mmap": check_mmap(),
+            "recovery": check_recovery(), "incremental": check_incremental(seed)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rat25F compiler benchmarks")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--declarations", type=int, default=50)
+    parser.add_argument("--statements", type=int, default=5000)
+    parser.add_argument("--depth", type=int, default=3, help="while/if nesting depth")
+    parser.add_argument("--expression-length", type=int, default=4)
+    parser.add_argument("--trace", action="store_true", help="produce the full syntax trace while parsing")
+    parser.add_argument("--compact", action="store_true", help="use the compact InstructionTable layout")
+    parser.add_argument("--memory", type=int, metavar="N",
+                        help="also compare InstructionTable layouts on N instructions")
+    parser.add_argument("--parse", action="store_true", help="also run the parse-only benchmark")
+    parser.add_argument("--tokens", action="store_true",
+                        help="also compare tuple tokens with the compact TokenStore")
+    parser.add_argument("--parsers", action="store_true",
+                        help="also compare recursive descent and LL(1) table-driven parse throughput")
+    parser.add_argument("--check", action="store_true",
+                        help="run correctness checks instead of benchmarks (exit status 1 on failure)")
+    parser.add_argument("--output", help="write JSON results to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    generator = ProgramGenerator(args.seed, args.declarations, args.statements,
+                                 args.depth, args.expression_length)
+    source = generator.generate()
+    if args.check:
+        results = run_checks(source, args.seed)
+        failed = any(check["mismatches"] for check in results.values())
+        write_results(results, args.output)
+        return 1 if failed else 0
+
+    results = {
+        "generator": {
+            "seed": args.seed,
+            "declarations": args.declarations,
+            "statements": args.statements,
+            "depth": args.depth,
+            "expression_length": args.expression_length,
+        },
+        "phases": bench_phases(source, TRACE_FULL if args.trace else TRACE_OFF, args.compact),
+    }
+    if args.parse:
+        results["parse"] = bench_parse(source)
+    if args.tokens:
+        results["tokens"] = bench_tokens(source)
+    if args.parsers:
+        results["parsers"] = bench_parsers(source)
+    if args.memory:
+        results["instruction_memory"] = bench_instruction_memory(args.memory)
+
+    write_results(results, args.output)
+    return 0
+
+
+def write_results(results, output=None):
+    """JSON results to the output file, or stdout"""
+    text = json.dumps(results, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
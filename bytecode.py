@@ -0,0 +1,131 @@
+import struct
+import sys
+from array import array
+
+from instruction_table import InstructionTable, OPS, OP_CODES, NIL
+from symbol_table import SymbolTable
+
+# File layout (all integers little-endian):
+#   header   magic, format version, op name count, instruction count, symbol count
+#   op names one length-prefixed UTF-8 name per op code used by the file
+#   code     int32 op code column, then int32 operand column (NIL = no operand),
+#            then (version 2 only) int32 second operand column for pair operands
+#   symbols  per symbol: memory address, type length, name length, type, name
+# Files without pair operands (superinstructions) are written as version 1.
+MAGIC = b"R25B"
+VERSION = 1
+PAIR_VERSION = 2
+HEADER = struct.Struct("<4sHHII")
+NAME = struct.Struct("<B")
+SYMBOL = struct.Struct("<iBH")
+
+
+def _column(values):
+    """int32 array in file byte order"""
+    column = array('i', values)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column
+
+
+def dump(instruction_table, symbol_table, f):
+    """Write an InstructionTable and SymbolTable to binary file object f"""
+    ops = []
+    operands = []
+    seconds = []
+    for address, op, operand in instruction_table.rows():
+        if op not in OP_CODES:
+            raise Exception(f"Error: Unknown instruction '{op}' at address {address}")
+        operand, second = InstructionTable.split(operand)
+        ops.append(OP_CODES[op])
+        operands.append(operand)
+        seconds.append(second)
+    pairs = any(second != NIL for second in seconds)
+    try:
+        ops, operands, seconds = _column(ops), _column(operands), _column(seconds if pairs else [])
+    except OverflowError:
+        raise Exception("Error: Operand does not fit in 32 bits")
+
+    symbols = list(symbol_table.symbols())
+    f.write(HEADER.pack(MAGIC, PAIR_VERSION if pairs else VERSION, len(OPS), len(ops), len(symbols)))
+    for name in OPS:
+        encoded = name.encode()
+        f.write(NAME.pack(len(encoded)) + encoded)
+    ops.tofile(f)
+    operands.tofile(f)
+    seconds.tofile(f)
+    for identifier, info in symbols:
+        var_type = info['type'].encode()
+        name = identifier.encode()
+        f.write(SYMBOL.pack(info['memory_address'], len(var_type), len(name)) + var_type + name)
+
+
+def _read(f, size):
+    data = f.read(size)
+    if len(data) != size:
+        raise Exception("Error: Truncated bytecode file")
+    return data
+
+
+def load(f, compact=True):
+    """
+    Read binary file object f written by dump().
+    Returns (InstructionTable, SymbolTable). With compact=True (the default)
+    the code columns are loaded straight into a compact InstructionTable,
+    ready for VirtualMachine, with no per-instruction parsing.
+    """
+    magic, version, op_count, count, symbol_count = HEADER.unpack(_read(f, HEADER.size))
+    if magic != MAGIC or version not in (VERSION, PAIR_VERSION):
+        raise Exception("Error: Not a Rat25F bytecode file")
+
+    names = []
+    for _ in range(op_count):
+        (size,) = NAME.unpack(_read(f, NAME.size))
+        names.append(_read(f, size).decode())
+
+    ops = array('i')
+    operands = array('i')
+    seconds = array('i')
+    ops.frombytes(_read(f, 4 * count))
+    operands.frombytes(_read(f, 4 * count))
+    if version == PAIR_VERSION:
+        seconds.frombytes(_read(f, 4 * count))
+    if sys.byteorder == "big":
+        ops.byteswap()
+        operands.byteswap()
+        seconds.byteswap()
+
+    if count and (min(ops) < 0 or max(ops) >= len(names)):
+        raise Exception("Error: Bad op code in bytecode file")
+
+    # Map the file's op codes onto this compiler's op codes
+    if names != list(OPS[:len(names)]):
+        try:
+            remap = [OP_CODES[name] for name in names]
+        except KeyError as e:
+            raise Exception(f"Error: Unknown instruction {e} in bytecode file")
+        ops = array('i', [remap[code] for code in ops])
+
+    instruction_table = InstructionTable(compact)
+    if compact:
+        instruction_table.ops = ops
+        instruction_table.operands = operands
+        instruction_table.second_operands = seconds if version == PAIR_VERSION else None
+        instruction_table.instr_address = count + 1
+    else:
+        for i, (code, operand) in enumerate(zip(ops, operands)):
+            if seconds and seconds[i] != NIL:
+                operand = (operand, seconds[i])
+            elif operand == NIL:
+                operand = None
+            instruction_table.gen_instr(OPS[code], operand)
+
+    symbols = []
+    memory_address = SymbolTable().memory_address
+    for _ in range(symbol_count):
+        address, type_size, name_size = SYMBOL.unpack(_read(f, SYMBOL.size))
+        var_type = _read(f, type_size).decode()
+        identifier = _read(f, name_size).decode()
+        symbols.append((identifier, {'memory_address': address, 'type': var_type}))
+        memory_address = max(memory_address, address + 1)
+    return instruction_table, SymbolTable.from_symbols(symbols, memory_address)
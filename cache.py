@@ -0,0 +1,133 @@
+import hashlib
+import os
+import pickle
+import tempfile
+
+from instruction_table import InstructionTable
+from symbol_table import SymbolTable
+
+CACHE_DIR = ".rat25f_cache"
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Compiler sources whose contents make up the compiler version, including
+# the driver (pass order) and this module (entry layout)
+COMPILER_FILES = ("lexer.py", "syntax.py", "symbol_table.py", "instruction_table.py", "optimizer.py",
+                  "allocator.py", "token_store.py", "superinstructions.py", "main.py", "cache.py")
+
+
+def compiler_version():
+    """Hash of the compiler sources, so any compiler change invalidates the cache"""
+    digest = hashlib.sha256()
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in COMPILER_FILES:
+        with open(os.path.join(here, name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def recording(tokens, log):
+    """Pass tokens through unchanged while appending each one to log"""
+    for token in tokens:
+        log.append(token)
+        yield token
+
+
+class CompilationCache:
+    """
+    Content-addressed on-disk cache of compilation results.
+    - key: SHA-256 of compiler version, compile options and source text
+    - entry: pickled dict with the token stream, instruction table rows,
+      symbol table, syntax trace, optimizer, allocation and fusion reports
+    - eviction: least recently used first (hits refresh the file's mtime)
+      once the cache directory grows past max_bytes
+    """
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.version = compiler_version()
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, source_code, *options):
+        digest = hashlib.sha256()
+        digest.update(self.version.encode())
+        digest.update(repr(options).encode())
+        if isinstance(source_code, str):
+            source_code = source_code.encode("utf-8", "surrogatepass")
+        digest.update(source_code)  # bytes-like sources (e.g. an mmap) are hashed in place
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".pkl")
+
+    def get(self, key):
+        """Return the cached entry for key, or None on a miss"""
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                entry = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        return entry
+
+    def put(self, key, entry):
+        """Store entry atomically (safe with several worker processes)"""
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(entry, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self.path(key))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for item in it:
+                if item.name.endswith(".pkl"):
+                    stat = item.stat()
+                    entries.append((stat.st_mtime, stat.st_size, item.path))
+                    total += stat.st_size
+
+        removed = 0
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+    @staticmethod
+    def make_entry(tokens, instruction_table, symbol_table, trace, report=None, allocation=None, fusion=None):
+        return {
+            "tokens": tokens,
+            "instructions": [(op, operand) for address, op, operand in instruction_table.rows()],
+            "compact": instruction_table.compact,
+            "symbols": list(symbol_table.symbols()),
+            "memory_address": symbol_table.memory_address,
+            "trace": trace,
+            "report": report,
+            "allocation": allocation,
+            "fusion": fusion,
+        }
+
+    @staticmethod
+    def restore(entry):
+        """Rebuild (InstructionTable, SymbolTable) from a cache entry"""
+        instruction_table = InstructionTable(entry["compact"])
+        for op, operand in entry["instructions"]:
+            instruction_table.gen_instr(op, operand)
+
+        symbol_table = SymbolTable.from_symbols(entry["symbols"], entry["memory_address"])
+        return instruction_table, symbol_table
@@ -0,0 +1,217 @@
+from instruction_table import JUMPS
+
+
+class BasicBlock:
+    """
+    Straight-line run of instructions, addresses start..end-1 (1-based like
+    the InstructionTable), with predecessor and successor block indexes.
+    """
+    def __init__(self, index, start, end):
+        self.index = index
+        self.start = start
+        self.end = end
+        self.preds = []
+        self.succs = []
+
+    def __len__(self):
+        return self.end - self.start
+
+
+class Loop:
+    """
+    Natural loop found from a back edge (latch -> header, where the header
+    dominates the latch). blocks holds the indexes of every block in the
+    body, header included; parent is the enclosing Loop, or None.
+    """
+    def __init__(self, header):
+        self.header = header
+        self.blocks = {header}
+        self.latches = []
+        self.parent = None
+        self.children = []
+        self.depth = 1
+
+
+class ControlFlowGraph:
+    """
+    Control flow graph over the code in an InstructionTable.
+    - blocks: BasicBlocks in address order. A block starts at the first
+      instruction, at every LABEL and jump target, and after every JUMP or
+      JUMPZ, so each while loop header (its LABEL) starts a block
+    - block_at: block index for each instruction (0-based instruction index)
+    - order: reverse postorder of the blocks reachable from the entry
+    - idom: immediate dominator per block (None for the entry block and
+      for unreachable blocks)
+    - loops: natural loops, outermost first; loop_of gives the innermost
+      Loop per block (None outside loops) and loop_depth its nesting depth
+    A jump to the address just past the last instruction ends the program
+    and adds no successor.
+    """
+    def __init__(self, instruction_table):
+        self.code = [(op, operand) for address, op, operand in instruction_table.rows()]
+        self.blocks = []
+        self.block_at = []
+        self.build_blocks()
+        self.link_blocks()
+        self.order = self.reverse_postorder()
+        self.idom = self.dominators()
+        self.loops = self.find_loops()
+        self.loop_of = [None] * len(self.blocks)
+        self.loop_depth = [0] * len(self.blocks)
+        for loop in self.loops:  # outermost first, so inner loops overwrite
+            for index in loop.blocks:
+                self.loop_of[index] = loop
+                self.loop_depth[index] = loop.depth
+
+    def jump_target(self, op, operand):
+        """0-based instruction index a jump lands on, None if it leaves the code"""
+        if op in JUMPS and operand is not None and 1 <= operand <= len(self.code):
+            return operand - 1
+        return None
+
+    def build_blocks(self):
+        count = len(self.code)
+        leaders = {0} if count else set()
+        for i, (op, operand) in enumerate(self.code):
+            if op == 'LABEL':
+                leaders.add(i)
+            if op in JUMPS:
+                target = self.jump_target(op, operand)
+                if target is not None:
+                    leaders.add(target)
+                if i + 1 < count:
+                    leaders.add(i + 1)
+
+        starts = sorted(leaders)
+        for index, start in enumerate(starts):
+            end = starts[index + 1] if index + 1 < len(starts) else count
+            self.blocks.append(BasicBlock(index, start + 1, end + 1))
+            self.block_at.extend([index] * (end - start))
+
+    def link_blocks(self):
+        for block in self.blocks:
+            op, operand = self.code[block.end - 2]
+            succs = []
+            target = self.jump_target(op, operand)
+            if target is not None:
+                succs.append(self.block_at[target])
+            if op != 'JUMP' and block.index + 1 < len(self.blocks):
+                succs.append(block.index + 1)
+            for succ in dict.fromkeys(succs):
+                block.succs.append(succ)
+                self.blocks[succ].preds.append(block.index)
+
+    def reverse_postorder(self):
+        if not self.blocks:
+            return []
+        seen = {0}
+        postorder = []
+        stack = [(0, iter(self.blocks[0].succs))]
+        while stack:
+            index, succs = stack[-1]
+            for succ in succs:
+                if succ not in seen:
+                    seen.add(succ)
+                    stack.append((succ, iter(self.blocks[succ].succs)))
+                    break
+            else:
+                stack.pop()
+                postorder.append(index)
+        postorder.reverse()
+        return postorder
+
+    def dominators(self):
+        """Immediate dominators (Cooper, Harvey and Kennedy's iterative algorithm)"""
+        idom = [None] * len(self.blocks)
+        if not self.order:
+            return idom
+        position = {index: i for i, index in enumerate(self.order)}
+        entry = self.order[0]
+        idom[entry] = entry
+
+        def intersect(a, b):
+            while a != b:
+                while position[a] > position[b]:
+                    a = idom[a]
+                while position[b] > position[a]:
+                    b = idom[b]
+            return a
+
+        changed = True
+        while changed:
+            changed = False
+            for index in self.order[1:]:
+                new_idom = None
+                for pred in self.blocks[index].preds:
+                    if idom[pred] is None:
+                        continue
+                    new_idom = pred if new_idom is None else intersect(pred, new_idom)
+                if idom[index] != new_idom:
+                    idom[index] = new_idom
+                    changed = True
+
+        idom[entry] = None
+        return idom
+
+    def dominates(self, a, b):
+        """True if block a dominates block b (every block dominates itself)"""
+        if self.idom[b] is None and b != (self.order[0] if self.order else None):
+            return False  # unreachable
+        while b is not None:
+            if b == a:
+                return True
+            b = self.idom[b]
+        return False
+
+    def find_loops(self):
+        """Natural loops, merged per header and nested by body containment"""
+        by_header = {}
+        for index in self.order:
+            for succ in self.blocks[index].succs:
+                if self.dominates(succ, index):
+                    loop = by_header.setdefault(succ, Loop(succ))
+                    loop.latches.append(index)
+                    work = [index]
+                    while work:
+                        body = work.pop()
+                        if body not in loop.blocks:
+                            loop.blocks.add(body)
+                            work.extend(self.blocks[body].preds)
+
+        # Parent = smallest other loop whose body holds this loop's header
+        loops = sorted(by_header.values(), key=lambda loop: len(loop.blocks))
+        for i, loop in enumerate(loops):
+            for outer in loops[i + 1:]:
+                if loop.header in outer.blocks:
+                    loop.parent = outer
+                    outer.children.append(loop)
+                    break
+        loops.reverse()
+        for loop in loops:
+            if loop.parent is not None:
+                loop.depth = loop.parent.depth + 1
+        return loops
+
+    def unreachable(self):
+        """Indexes of blocks that no path from the entry reaches"""
+        reached = set(self.order)
+        return [block.index for block in self.blocks if block.index not in reached]
+
+    def format_graph(self):
+        """Yield listing lines: one per block, then one per loop"""
+        yield "\nControl Flow Graph"
+        yield "=" * 50
+        for block in self.blocks:
+            idom = self.idom[block.index]
+            yield (f"B{block.index:<4} {block.start:>5}-{block.end - 1:<5} "
+                   f"preds {','.join(map(str, block.preds)) or '-':<10} "
+                   f"succs {','.join(map(str, block.succs)) or '-':<10} "
+                   f"idom {'-' if idom is None else idom:<5} depth {self.loop_depth[block.index]}")
+        for loop in self.loops:
+            yield (f"Loop B{loop.header} (address {self.blocks[loop.header].start}): "
+                   f"{len(loop.blocks)} blocks, depth {loop.depth}, "
+                   f"latches {','.join(map(str, loop.latches))}")
+
+    def print_graph(self):
+        """Listing lines as a list (see format_graph)"""
+        return list(self.format_graph())
@@ -0,0 +1,211 @@
+import argparse
+import json
+import sys
+from collections import Counter
+
+from cfg import ControlFlowGraph
+from lexer import LexicalAnalyzer
+from superinstructions import SuperinstructionFuser
+from syntax import SyntaxAnalyzer, TRACE_OFF
+from vm import VirtualMachine, VMError
+
+MODES = ("block", "instruction")
+
+
+def compile_with_lines(source, compact=False):
+    """
+    Compile source, recording the source line of every generated
+    instruction (the line of the last token read when it was generated).
+    Returns (instruction_table, symbol_table, lines) with lines[i] the
+    line of address i + 1.
+    """
+    store = LexicalAnalyzer().store(source)
+    s_analyzer = SyntaxAnalyzer(store, TRACE_OFF, compact=compact)
+    lines = []
+    gen_instr = s_analyzer.instruction_table.gen_instr
+
+    def gen_instr_with_line(op, operand=None):
+        lines.append(store.position(max(s_analyzer.current_index - 1, 0))[0])
+        return gen_instr(op, operand)
+
+    s_analyzer.instruction_table.gen_instr = gen_instr_with_line
+    success, output = s_analyzer.parse()
+    if not success:
+        raise Exception(output[0])
+    return s_analyzer.instruction_table, s_analyzer.symbol_table, lines
+
+
+class ExecutionProfiler:
+    """
+    Runs a program on the VirtualMachine and counts what executes.
+    - mode "block" (default): one counter per basic block, bumped when the
+      block is entered; each instruction gets its block's count. Costs one
+      increment per block executed.
+    - mode "instruction": one counter per instruction, exact, at one
+      increment per instruction executed.
+    Without a profiler the VM runs with no counting at all, and max_steps
+    bounds a profiled run like any other.
+    After run(): counts per instruction, plus loops() (per loop header
+    LABEL), line_counts() and hotspots() when source lines are known.
+    """
+    def __init__(self, instruction_table, lines=None, mode="block"):
+        if mode not in MODES:
+            raise Exception(f"Error: Unknown profiling mode '{mode}'")
+        self.instruction_table = instruction_table
+        self.lines = lines
+        self.mode = mode
+        self.cfg = ControlFlowGraph(instruction_table)
+        self.code = self.cfg.code
+        self.counts = [0] * len(self.code)
+        self.steps = 0
+
+    def run(self, stdin=None, stdout=None, max_steps=None):
+        """Execute the program once, adding to the counts. Returns the step count."""
+        vm = VirtualMachine(self.instruction_table, stdin, stdout, max_steps)
+        if self.mode == "block":
+            hits = vm.count_hits([block.start - 1 for block in self.cfg.blocks])
+        else:
+            hits = vm.count_hits(list(range(len(self.code))))
+        try:
+            vm.run()
+        finally:
+            self.steps += vm.steps
+            if self.mode == "block":
+                for block, count in zip(self.cfg.blocks, hits):
+                    for i in range(block.start - 1, block.end - 1):
+                        self.counts[i] += count
+                # Stopped partway through a block: its tail never ran
+                if vm.pc < len(self.code):
+                    block = self.cfg.blocks[self.cfg.block_at[vm.pc]]
+                    if vm.pc != block.start - 1:
+                        for i in range(vm.pc, block.end - 1):
+                            self.counts[i] -= 1
+            else:
+                for i, count in enumerate(hits):
+                    self.counts[i] += count
+        return vm.steps
+
+    def line_of(self, address):
+        return self.lines[address - 1] if self.lines else None
+
+    def loops(self):
+        """
+        One dict per loop, outermost first: header address (the while
+        LABEL), its source line, iterations (header hits), instructions
+        executed in the body and nesting depth.
+        """
+        result = []
+        for loop in self.cfg.loops:
+            header = self.cfg.blocks[loop.header].start
+            executed = sum(self.counts[i]
+                           for index in loop.blocks
+                           for i in range(self.cfg.blocks[index].start - 1, self.cfg.blocks[index].end - 1))
+            result.append({
+                "address": header,
+                "op": self.code[header - 1][0],
+                "line": self.line_of(header),
+                "iterations": self.counts[header - 1],
+                "instructions": executed,
+                "depth": loop.depth,
+            })
+        return result
+
+    def line_counts(self):
+        """Instructions executed per source line"""
+        counts = Counter()
+        if self.lines:
+            for line, count in zip(self.lines, self.counts):
+                if count:
+                    counts[line] += count
+        return counts
+
+    def hotspots(self, top=10):
+        """The top source lines by instructions executed, as (line, count)"""
+        return self.line_counts().most_common(top)
+
+    def hot_instructions(self, top=10):
+        """The top instructions by hit count, as (address, op, operand, count)"""
+        ranked = sorted(range(len(self.code)), key=lambda i: -self.counts[i])[:top]
+        return [(i + 1, self.code[i][0], self.code[i][1], self.counts[i]) for i in ranked if self.counts[i]]
+
+    def to_dict(self, top=10):
+        return {
+            "mode": self.mode,
+            "steps": self.steps,
+            "loops": self.loops(),
+            "hot_lines": [{"line": line, "instructions": count} for line, count in self.hotspots(top)],
+            "hot_instructions": [{"address": address, "op": op, "operand": operand, "hits": count}
+                                 for address, op, operand, count in self.hot_instructions(top)],
+        }
+
+    def format_report(self, top=10, source=None):
+        """Yield report lines; with source, hot lines show their text"""
+        text = source.splitlines() if source is not None else None
+        total = self.steps or 1
+        yield "\nExecution Profile"
+        yield "=" * 50
+        yield f"Instructions executed: {self.steps} ({self.mode} counts)"
+
+        yield "\nLoops"
+        yield "-" * 50
+        for loop in self.loops():
+            indent = "  " * (loop["depth"] - 1)
+            yield (f"{indent}{loop['op']} {loop['address']:<5} line {loop['line'] or '-':<5} "
+                   f"iterations {loop['iterations']:<10} instructions {loop['instructions']}")
+
+        if self.lines:
+            yield "\nHot Lines"
+            yield "-" * 50
+            for line, count in self.hotspots(top):
+                code = text[line - 1].strip() if text and line <= len(text) else ""
+                yield f"line {line:<6} {count:<12} {100 * count / total:5.1f}%  {code}"
+
+        yield "\nHot Instructions"
+        yield "-" * 50
+        for address, op, operand, count in self.hot_instructions(top):
+            instruction = op if operand is None else f"{op} {operand}"
+            yield f"{address:<5} {instruction:<16} {count}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a Rat25F program and report where it spends its time")
+    parser.add_argument("source", help="Rat25F source file")
+    parser.add_argument("--top", type=int, default=10, help="number of hotspots to report (default: 10)")
+    parser.add_argument("--mode", choices=MODES, default="block",
+                        help="count basic block entries (cheaper) or every instruction")
+    parser.add_argument("--input", help="file to use as the program's standard input")
+    parser.add_argument("--max-steps", type=int, help="stop after this many instructions")
+    parser.add_argument("--fuse", action="store_true", help="profile the code with superinstructions")
+    parser.add_argument("--json", help="also write the profile as JSON to this file")
+    args = parser.parse_args(argv)
+
+    with open(args.source) as f:
+        source = f.read()
+    instruction_table, symbol_table, lines = compile_with_lines(source)
+    if args.fuse:
+        fuser = SuperinstructionFuser()
+        instruction_table = fuser.fuse(instruction_table)
+        lines = [lines[address - 1] for address in fuser.origins]
+    profiler = ExecutionProfiler(instruction_table, lines, args.mode)
+    stdin = open(args.input) if args.input else sys.stdin
+    status = 0
+    try:
+        profiler.run(stdin, sys.stdout, args.max_steps)
+    except VMError as e:
+        # A runtime error or the --max-steps bound: report what did run
+        print(e)
+        status = 1
+    finally:
+        if args.input:
+            stdin.close()
+        for line in profiler.format_report(args.top, source):
+            print(line)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(profiler.to_dict(args.top), f, indent=2)
+                f.write("\n")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+from itertools import chain
+
+from instruction_table import JUMPS
+from lexer import LexicalAnalyzer
+from syntax import SyntaxAnalyzer, TRACE_OFF
+from token_store import IDENTIFIER, EOF
+
+QUOTES = ('"', '“')
+
+
+class IncrementalCompiler:
+    """
+    Incremental recompilation for editor integration.
+    - compile(): full compile that records, for every top-level statement,
+      its token range and its instruction address range
+    - edit(): applies a text change, re-lexes and re-parses only the
+      top-level statements the change touches, and splices the new code
+      into the InstructionTable (later jumps and addresses are fixed up)
+    Tokens outside the edit and the symbol table built from the declaration
+    section are reused. Edits that reach the header or declarations or the
+    closing '#', that would merge tokens across the edited region, or that
+    fail to re-parse on their own fall back to a full compile.
+    """
+    def __init__(self, compact=False):
+        self.lexer = LexicalAnalyzer()
+        self.compact = compact
+        self.source = ""
+        self.tokens = []      # (token_type, lexeme, start, end)
+        self.statements = []  # [first_token, end_token, start_address, end_address]
+        self.symbol_table = None
+        self.instruction_table = None
+        self.full_compiles = 0
+        self.incremental_compiles = 0
+
+    def analyzer(self, tokens):
+        """SyntaxAnalyzer over (token_type, lexeme) pairs of tokens plus EOF"""
+        pairs = chain(((token[0], token[1]) for token in tokens), [("EOF", "")])
+        return SyntaxAnalyzer(pairs, TRACE_OFF, compact=self.compact)
+
+    def starts_statement(self, s_analyzer):
+        """True if the analyzer's lookahead can start a statement"""
+        return s_analyzer.current_code == IDENTIFIER or s_analyzer.current_lexeme in s_analyzer.STATEMENT_DISPATCH
+
+    def compile(self, source):
+        """
+        Full compile of source.
+        Returns (success, messages) like SyntaxAnalyzer.parse().
+        """
+        self.source = source
+        self.tokens = list(self.lexer.spans(source))
+        self.full_compiles += 1
+        s_analyzer = self.analyzer(self.tokens)
+        statements = []
+
+        try:
+            # R1 with the top-level <Statement List> unrolled
+            if not s_analyzer.match("#"):
+                s_analyzer.error("#")
+            s_analyzer.opt_declaration_list()
+            while True:
+                first = s_analyzer.current_index
+                address = s_analyzer.instruction_table.instr_address
+                s_analyzer.statement()
+                statements.append([first, s_analyzer.current_index,
+                                   address, s_analyzer.instruction_table.instr_address])
+                if not self.starts_statement(s_analyzer):
+                    break
+            if not s_analyzer.match("#"):
+                s_analyzer.error("#")
+            if s_analyzer.current_code != EOF:
+                raise SyntaxError(
+                    f"Unexpected token after program end: {s_analyzer.current_token}")
+        except (SyntaxError, Exception) as e:
+            self.statements = []
+            self.symbol_table = None
+            self.instruction_table = None
+            return False, [str(e)]
+
+        self.statements = statements
+        self.symbol_table = s_analyzer.symbol_table
+        self.instruction_table = s_analyzer.instruction_table
+        return True, []
+
+    def span(self, statement):
+        """Source offsets (start, end) of a top-level statement"""
+        first, end = statement[0], statement[1]
+        return self.tokens[first][2], self.tokens[end - 1][3]
+
+    def joins(self, left, right):
+        """True if two adjacent characters could lex as one token"""
+        word = lambda ch: ch.isalnum() or ch in "$."
+        return word(left) and word(right)
+
+    def edit(self, start, end, text):
+        """
+        Replace source[start:end] with text and recompile.
+        Returns (success, messages) like compile().
+        """
+        source = self.source[:start] + text + self.source[end:]
+        delta = len(text) - (end - start)
+        statements = self.statements
+        if self.instruction_table is None or not statements:
+            return self.compile(source)
+
+        # Top-level statements touched by the edit
+        if start < self.span(statements[0])[0] or end > self.span(statements[-1])[1]:
+            return self.compile(source)
+        i = next(k for k, stmt in enumerate(statements) if self.span(stmt)[1] >= start)
+        j = max(k for k, stmt in enumerate(statements) if self.span(stmt)[0] <= end)
+        if i > j:
+            # Edit falls between two statements: take both neighbours
+            i, j = j, i
+
+        # The region covers the statements and any edited whitespace around
+        # them, and must not begin or end inside a comment
+        first_token, end_token = statements[i][0], statements[j][1]
+        region_start = min(self.span(statements[i])[0], start)
+        region_end = max(self.span(statements[j])[1], end)
+        before = self.source[self.tokens[first_token - 1][3]:region_start]
+        after = self.source[region_end:self.tokens[end_token][2]]
+        region_end += delta
+        region = source[region_start:region_end]
+        if (any(sum(text.count(quote) for quote in QUOTES) % 2 for text in (region, before, after))
+                or (region and region_start > 0 and self.joins(source[region_start - 1], region[0]))
+                or (region and region_end < len(source) and self.joins(region[-1], source[region_end]))):
+            return self.compile(source)
+
+        # Re-lex and re-parse only the region, reusing the symbol table
+        new_tokens = list(self.lexer.spans(region, region_start))
+        s_analyzer = self.analyzer(new_tokens)
+        s_analyzer.symbol_table = self.symbol_table
+        new_statements = []
+        try:
+            while s_analyzer.current_code != EOF:
+                first = s_analyzer.current_index
+                address = s_analyzer.instruction_table.instr_address
+                s_analyzer.statement()
+                new_statements.append([first, s_analyzer.current_index,
+                                       address, s_analyzer.instruction_table.instr_address])
+        except (SyntaxError, Exception):
+            return self.compile(source)
+        if not new_statements and len(statements) == j - i + 1:
+            return self.compile(source)
+
+        # Splice code, relocating the region's jumps to its new base address
+        old_start, old_end = statements[i][2], statements[j][3]
+        base = old_start - 1
+        rows = [(op, operand + base if op in JUMPS and operand is not None else operand)
+                for address, op, operand in s_analyzer.instruction_table.rows()]
+        self.instruction_table.splice(old_start, old_end, rows)
+        shift = len(rows) - (old_end - old_start)
+
+        # Splice tokens, moving later offsets by the change in length
+        token_shift = len(new_tokens) - (end_token - first_token)
+        tail = [(token_type, lexeme, a + delta, b + delta)
+                for token_type, lexeme, a, b in self.tokens[end_token:]]
+        self.tokens[first_token:] = new_tokens + tail
+
+        self.statements[i:] = (
+            [[f + first_token, e + first_token, a + base, b + base] for f, e, a, b in new_statements]
+            + [[f + token_shift, e + token_shift, a + shift, b + shift] for f, e, a, b in statements[j + 1:]])
+        self.source = source
+        self.incremental_compiles += 1
+        return True, []
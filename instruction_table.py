@@ -1,3 +1,23 @@
+from array import array
+
+from listing import write_lines
+
+# Interned op codes used by the compact layout (index = op code)
+OPS = ('PUSHI', 'PUSHM', 'POPM', 'STDOUT', 'STDIN',
+       'ADD', 'SUB', 'MUL', 'DIV',
+       'GRT', 'LES', 'EQU', 'NEQ', 'GEQ', 'LEQ',
+       'JUMP', 'JUMPZ', 'LABEL',
+       # Superinstructions (see superinstructions.py)
+       'INCM', 'ADDMM', 'SUBMM', 'MULMM', 'DIVMM',
+       'GRTJZ', 'LESJZ', 'EQUJZ', 'NEQJZ', 'GEQJZ', 'LEQJZ')
+OP_CODES = {op: code for code, op in enumerate(OPS)}
+NIL = -2 ** 31  # Operand column value that stands for a 'nil' operand
+JUMPS = ('JUMP', 'JUMPZ',  # Ops whose operand is an instruction address
+         'GRTJZ', 'LESJZ', 'EQUJZ', 'NEQJZ', 'GEQJZ', 'LEQJZ')
+JUMP_CODES = {OP_CODES[op] for op in JUMPS}
+PAIR_OPS = ('INCM', 'ADDMM', 'SUBMM', 'MULMM', 'DIVMM')  # Ops whose operand is a pair
+
+
 class InstructionTable:
     """
     Instruction table for generating assembly code.
@@ -5,11 +25,25 @@ class InstructionTable:
     - instr_address: current instruction address (global)
     - gen_instr: generates instruction with op and operand
     - Stores in array structure
+
+    With compact=True the table is stored as two parallel array('i')
+    columns (op code, operand) instead of one dict per instruction.
+    Operands must then fit in a signed 32-bit int.
+
+    The ops in PAIR_OPS take a pair operand, e.g. INCM (address, k). In
+    the compact layout its second half goes in a third column,
+    second_operands, which is only created once a pair is generated.
     """
-    def __init__(self):
-        self.instructions = []
+    def __init__(self, compact=False):
+        self.compact = compact
+        if compact:
+            self.ops = array('i')
+            self.operands = array('i')
+            self.second_operands = None
+        else:
+            self.instructions = []
         self.instr_address = 1  # Start at 1 as shown in partial solutions
-    
+
     def gen_instr(self, op, operand=None):
         """
         Generate instruction following partial solutions format:
@@ -18,37 +52,130 @@ class InstructionTable:
         Instr_table[instr_address].oprnd = operand;
         instr_address++;
         """
-        self.instructions.append({
-            'address': self.instr_address,
-            'op': op,
-            'operand': operand
-        })
-        
+        if self.compact:
+            if op not in OP_CODES:
+                raise Exception(f"Error: Unknown instruction '{op}'")
+            operand, second = self.split(operand)
+            if second != NIL and self.second_operands is None:
+                self.second_operands = array('i', [NIL]) * len(self.ops)
+            self.ops.append(OP_CODES[op])
+            self.operands.append(operand)
+            if self.second_operands is not None:
+                self.second_operands.append(second)
+        else:
+            self.instructions.append({
+                'address': self.instr_address,
+                'op': op,
+                'operand': operand
+            })
+
         current_address = self.instr_address
         self.instr_address += 1
         return current_address
-    
+
+    @staticmethod
+    def split(operand):
+        """Compact column values (operand, second operand) for an operand"""
+        if operand is None:
+            return NIL, NIL
+        if isinstance(operand, tuple):
+            return operand
+        return operand, NIL
+
     def update_instruction(self, address, operand):
         """
         Update the operand of an instruction at given address.
         Used for back-patching jumps.
         """
-        if address > 0 and address <= len(self.instructions):
-            self.instructions[address - 1]['operand'] = operand
-    
-    def print_instructions(self):
+        if address > 0 and address < self.instr_address:
+            if self.compact:
+                self.operands[address - 1] = NIL if operand is None else operand
+            else:
+                self.instructions[address - 1]['operand'] = operand
+
+    def splice(self, start, end, rows):
+        """
+        Replace the instructions at addresses start..end-1 with rows, a list
+        of (op, operand) whose jump operands are already absolute.
+        Later instructions move by the size difference and every jump to an
+        address >= end is shifted to match.
         """
-        Print instructions ignoring 'nil' operands as specified in partial solutions.
+        shift = len(rows) - (end - start)
+        new_end = start + len(rows)
+        if self.compact:
+            for op, operand in rows:
+                if op not in OP_CODES:
+                    raise Exception(f"Error: Unknown instruction '{op}'")
+            columns = [self.split(operand) for op, operand in rows]
+            if self.second_operands is None and any(second != NIL for first, second in columns):
+                self.second_operands = array('i', [NIL]) * len(self.ops)
+            self.ops[start - 1:end - 1] = array('i', [OP_CODES[op] for op, operand in rows])
+            self.operands[start - 1:end - 1] = array('i', [first for first, second in columns])
+            if self.second_operands is not None:
+                self.second_operands[start - 1:end - 1] = array('i', [second for first, second in columns])
+            if shift:
+                ops, operands = self.ops, self.operands
+                for i in range(len(ops)):
+                    if ops[i] in JUMP_CODES and operands[i] >= end and not start - 1 <= i < new_end - 1:
+                        operands[i] += shift
+        else:
+            self.instructions[start - 1:end - 1] = [
+                {'address': start + i, 'op': op, 'operand': operand}
+                for i, (op, operand) in enumerate(rows)]
+            if shift:
+                for i, instr in enumerate(self.instructions):
+                    if start - 1 <= i < new_end - 1:
+                        continue
+                    if i >= new_end - 1:
+                        instr['address'] = i + 1
+                    if instr['op'] in JUMPS and instr['operand'] is not None and instr['operand'] >= end:
+                        instr['operand'] += shift
+        self.instr_address += shift
+
+    def rows(self):
+        """Yield (address, op, operand) for every instruction, in either layout"""
+        if self.compact and self.second_operands is not None:
+            address = 1
+            for code, operand, second in zip(self.ops, self.operands, self.second_operands):
+                if second != NIL:
+                    yield address, OPS[code], (operand, second)
+                else:
+                    yield address, OPS[code], None if operand == NIL else operand
+                address += 1
+        elif self.compact:
+            address = 1
+            for code, operand in zip(self.ops, self.operands):
+                yield address, OPS[code], None if operand == NIL else operand
+                address += 1
+        else:
+            for instr in self.instructions:
+                yield instr['address'], instr['op'], instr['operand']
+
+    def __len__(self):
+        return self.instr_address - 1
+
+    def format_instructions(self):
+        """
+        Yield listing lines, ignoring 'nil' operands as specified in partial solutions.
         Format: address  op  operand (if not nil)
         """
-        output = []
-        output.append("\nAssembly Code")
-        output.append("=" * 50)
-        for instr in self.instructions:
-            if instr['operand'] is None:
+        yield "\nAssembly Code"
+        yield "=" * 50
+        for address, op, operand in self.rows():
+            if operand is None:
                 # Print without operand (like "LABEL" or "ADD")
-                output.append(f"{instr['address']:<5} {instr['op']}")
+                yield f"{address:<5} {op}"
+            elif isinstance(operand, tuple):
+                # Superinstruction with a pair operand, e.g. "INCM 10001, 1"
+                yield f"{address:<5} {op} {operand[0]}, {operand[1]}"
             else:
                 # Print with operand
-                output.append(f"{instr['address']:<5} {instr['op']} {instr['operand']}")
-        return output
\ No newline at end of file
+                yield f"{address:<5} {op} {operand}"
+
+    def write_instructions(self, f, chunk_size=4096):
+        """Stream the listing into file object f (see write_lines)"""
+        write_lines(f, self.format_instructions(), chunk_size)
+
+    def print_instructions(self):
+        """Listing lines as a list (see format_instructions)"""
+        return list(self.format_instructions())
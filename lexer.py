@@ -1,5 +1,88 @@
 
+import mmap
+import os
+import re
+from functools import lru_cache
+
+from token_store import TokenStore, TYPE_CODES, EOF
+
+
+# Characters that end an invalid Integer/Real lexeme (whitespace, separators,
+# or the start of an operator), mirroring the skip loops in the FSMs below.
+# A comment quote also ends one, since comments are no longer stripped first.
+_DELIMITER = r"(?:\s|[(){}\[\],;:.#+\-*/%=<>\"“]|!=|\|\||&&)"
+
+# Byte-level equivalents for lexing an ASCII memory-mapped buffer in place.
+# \s on bytes misses \x1c-\x1f, which str.isspace() counts as whitespace.
+_BYTES_SPACE = rb"[\s\x1c-\x1f]"
+_BYTES_DELIMITER = rb"(?:" + _BYTES_SPACE + rb"|[(){}\[\],;:.#+\-*/%=<>\"]|!=|\|\||&&)"
+_NON_ASCII = re.compile(rb"[\x80-\xff]")
+
+
+
+@lru_cache(maxsize=32)
+def _token_pattern(numeric=""):
+    """
+    Master pattern for the single-pass scanner. Comments ("..." regions,
+    unterminated ones run to end of input) are skipped like whitespace.
+    The remaining alternatives are tried in the same order as the FSMs in
+    lexer(): identifier, real, integer, then operators and separators.
+    Anything else is a one character error.
+
+    Regex classes are close to, but not the same as, the str methods the
+    FSMs use: [^\W\d_] (letter) also matches numeric characters such as
+    '²' or '½', and \d (isdecimal) misses digits such as '²'. numeric lists
+    those characters (alphanumeric, not alphabetic, not decimal) so the
+    pattern can treat them exactly like isalpha()/isdigit() do.
+    """
+    numeric_class = re.escape(numeric)
+    digit = r"[\d%s]" % re.escape("".join(ch for ch in numeric if ch.isdigit()))
+    letter = r"[^\W\d_%s]" % numeric_class
+    return re.compile(r"""
+          (?P<space>\s+)
+        | (?P<comment>["“][^"“]*["“]?)
+        | (?P<identifier>%(letter)s(?:[^\W_]|\$)*)
+        | (?P<real>%(digit)s*\.%(digit)s+(?!%(letter)s|%(digit)s))
+        | (?P<bad_real>%(digit)s*\.%(digit)s*(?:(?!%(delim)s).)*)
+        | (?P<integer>%(digit)s+(?!%(letter)s|%(digit)s))
+        | (?P<bad_integer>%(digit)s+(?:(?!%(delim)s).)*)
+        | (?P<operator>==|!=|>=|<=|\|\||&&|[+\-*/%%=<>])
+        | (?P<separator>[(){}\[\],;:.#])
+        | (?P<error>.)
+    """ % {"delim": _DELIMITER, "letter": letter, "digit": digit}, re.VERBOSE | re.DOTALL)
+
+
 class LexicalAnalyzer:
+    # Master pattern for text without numeric characters (see _token_pattern)
+    TOKEN_PATTERN = _token_pattern()
+
+    # Byte pattern with the same alternatives for ASCII text, used by scan_buffer()
+    BYTES_TOKEN_PATTERN = re.compile(rb"""
+          (?P<space>%(space)s+)
+        | (?P<comment>"[^"]*"?)
+        | (?P<identifier>[A-Za-z][A-Za-z0-9$]*)
+        | (?P<real>[0-9]*\.[0-9]+(?![A-Za-z0-9]))
+        | (?P<bad_real>[0-9]*\.[0-9]*(?:(?!%(delim)s).)*)
+        | (?P<integer>[0-9]+(?![A-Za-z0-9]))
+        | (?P<bad_integer>[0-9]+(?:(?!%(delim)s).)*)
+        | (?P<operator>==|!=|>=|<=|\|\||&&|[+\-*/%%=<>])
+        | (?P<separator>[(){}\[\],;:.\#])
+        | (?P<error>.)
+    """ % {b"space": _BYTES_SPACE, b"delim": _BYTES_DELIMITER}, re.VERBOSE | re.DOTALL)
+
+    @classmethod
+    def token_pattern(cls, text):
+        """The master pattern for text, exact for any numeric characters it contains"""
+        if text.isascii():
+            return cls.TOKEN_PATTERN
+        numeric = "".join(sorted(ch for ch in set(text)
+                                 if ch.isalnum() and not ch.isalpha() and not ch.isdecimal()))
+        return _token_pattern(numeric) if numeric else cls.TOKEN_PATTERN
+
+    # Pattern groups that produce tokens, and their token types
+    TOKEN_TYPES = {"identifier": "Identifier", "integer": "Integer", "real": "Real",
+                   "operator": "Operator", "separator": "Separator"}
+
     def __init__(self):
         self.keywords = {'integer', 'boolean', 'function', 'real',  'if', 'else', 'fi', 'return', 'put', 'get', 'while', 'true', 'false'}
         self.operators = {'==', '!=', '>=', '<=', '+', '-', '*', '/', '%', '=', '<', '>', '||', '&&'}
@@ -127,5 +210,166 @@ class LexicalAnalyzer:
         
         return None, None, start_index+1
 
+    def scan(self, text):
+        """
+        Single-pass scanner over raw source text.
+        Lowercases the buffer once and walks it with one compiled pattern,
+        skipping comments in place and yielding the same (token_type, lexeme)
+        tuples as repeated lexer() calls.
+        self.line and self.column hold the position of the last token yielded.
+        text may also be a bytes-like buffer (see open_source), which is
+        lexed in place by scan_buffer() when it is ASCII.
+        """
+        text = self.source_text(text)
+        if not isinstance(text, str):
+            yield from self.scan_buffer(text)
+            return
+
+        text = text.lower()
+        keywords = self.keywords
+        kinds = self.TOKEN_TYPES
+        self.line = 1
+        self.column = 1
+        line_start = 0
+        pos = 0
+
+        for m in self.token_pattern(text).finditer(text):
+            token_type = kinds.get(m.lastgroup)
+            if token_type is None:
+                continue
+
+            # Line tracking: count newlines skipped since the last token
+            start = m.start()
+            newlines = text.count("\n", pos, start)
+            if newlines:
+                self.line += newlines
+                line_start = text.rfind("\n", pos, start) + 1
+            self.column = start - line_start + 1
+            pos = start
+
+            lexeme = m.group()
+            if token_type == "Identifier" and lexeme in keywords:
+                token_type = "Keyword"
+            yield token_type, lexeme
+
+    @staticmethod
+    def open_source(path):
+        """
+        Memory-map a source file read-only for scan_buffer().
+        Returns an mmap (b"" for an empty file, which cannot be mapped).
+        """
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @staticmethod
+    def source_text(text):
+        """
+        text, or a UTF-8 bytes-like buffer decoded to str if it holds any
+        non-ASCII byte: the byte pattern only matches the str scanner on
+        ASCII, so such files are lexed from a decoded copy.
+        """
+        if isinstance(text, str) or not _NON_ASCII.search(text):
+            return text
+        return str(text, "utf-8")
+
+    def scan_buffer(self, buffer):
+        """
+        scan() over an ASCII bytes-like buffer such as an mmap, without
+        decoding or copying it. Lexemes are only decoded (and identifiers
+        lowercased) when their token is yielded, so memory use stays close
+        to the size of the file. Columns count bytes.
+        """
+        keywords = self.keywords
+        kinds = self.TOKEN_TYPES
+        self.line = 1
+        self.column = 1
+        line_start = 0
+        pos = 0
+
+        for m in self.BYTES_TOKEN_PATTERN.finditer(buffer):
+            token_type = kinds.get(m.lastgroup)
+            if token_type is None:
+                continue
+
+            # Line tracking: find newlines skipped since the last token
+            start = m.start()
+            newline = buffer.find(b"\n", pos, start)
+            while newline != -1:
+                self.line += 1
+                line_start = newline + 1
+                newline = buffer.find(b"\n", line_start, start)
+            self.column = start - line_start + 1
+            pos = start
+
+            lexeme = m.group().decode("ascii")
+            if token_type == "Identifier":
+                lexeme = lexeme.lower()
+                if lexeme in keywords:
+                    token_type = "Keyword"
+            yield token_type, lexeme
+
+    def spans(self, text, offset=0):
+        """
+        Like scan(), but yields (token_type, lexeme, start, end) where start
+        and end are source offsets of the lexeme (plus offset).
+        An ASCII bytes-like buffer is lexed in place with byte offsets.
+        """
+        text = self.source_text(text)
+        if not isinstance(text, str):
+            yield from self.buffer_spans(text, offset)
+            return
+
+        text = text.lower()
+        keywords = self.keywords
+        kinds = self.TOKEN_TYPES
+
+        for m in self.token_pattern(text).finditer(text):
+            token_type = kinds.get(m.lastgroup)
+            if token_type is None:
+                continue
+            lexeme = m.group()
+            if token_type == "Identifier" and lexeme in keywords:
+                token_type = "Keyword"
+            yield token_type, lexeme, m.start() + offset, m.end() + offset
+
+    def buffer_spans(self, buffer, offset=0):
+        """spans() over an ASCII bytes-like buffer, as in scan_buffer()"""
+        keywords = self.keywords
+        kinds = self.TOKEN_TYPES
+
+        for m in self.BYTES_TOKEN_PATTERN.finditer(buffer):
+            token_type = kinds.get(m.lastgroup)
+            if token_type is None:
+                continue
+            lexeme = m.group().decode("ascii")
+            if token_type == "Identifier":
+                lexeme = lexeme.lower()
+                if lexeme in keywords:
+                    token_type = "Keyword"
+            yield token_type, lexeme, m.start() + offset, m.end() + offset
+
+    def store(self, text):
+        """
+        Lex all of text into a TokenStore (type codes, interned lexemes and
+        source spans), ending with the EOF token.
+        """
+        text = self.source_text(text)
+        store = TokenStore(text)
+        append = store.append
+        for token_type, lexeme, start, end in self.spans(text):
+            append(TYPE_CODES[token_type], lexeme, start, end)
+        append(EOF, "", len(text), len(text))
+        return store
+
+    def tokens(self, text):
+        """
+        Token stream for the parser: scan() followed by the EOF marker.
+        Tokens are produced lazily, so the parser can start before lexing ends.
+        """
+        yield from self.scan(text)
+        yield "EOF", ""
+
 if __name__ == '__main__':
     pass
@@ -0,0 +1,11 @@
+from itertools import islice
+
+
+def write_lines(f, lines, chunk_size=4096):
+    """Stream the lines of a listing into file object f, chunk_size lines per write()"""
+    lines = iter(lines)
+    while True:
+        chunk = list(islice(lines, chunk_size))
+        if not chunk:
+            break
+        f.write("\n".join(chunk) + "\n")
@@ -0,0 +1,367 @@
+from symbol_table import SymbolTable
+from instruction_table import InstructionTable
+from syntax import TRACE_PRODUCTIONS, TRACE_FULL
+
+# R1-R29 in LL(1) form. Each alternative is a list of symbols:
+# - "<Name>" is a nonterminal
+# - "@name" is a semantic action (LL1Analyzer.action_name), run when popped
+# - anything else is a terminal: a token type for identifiers and
+#   integers, the lexeme otherwise
+# Right recursion and common prefixes are factored into the *Tail rules.
+GRAMMAR = {
+    "Rat25F": [["#", "<Opt Declaration List>", "<Statement List>", "#"]],
+    "Opt Declaration List": [["<Declaration List>"], []],
+    "Declaration List": [["<Declaration>", ";", "<Declaration List Tail>"]],
+    "Declaration List Tail": [["<Declaration List>"], []],
+    "Declaration": [["<Qualifier>", "<IDs>"]],
+    "Qualifier": [["integer", "@qualifier"], ["boolean", "@qualifier"]],
+    "IDs": [["Identifier", "@declare", "<IDs Tail>"]],
+    "IDs Tail": [[",", "<IDs>"], []],
+    "Statement List": [["<Statement>", "<Statement List Tail>"]],
+    "Statement List Tail": [["<Statement List>"], []],
+    "Statement": [["<Compound>"], ["<Assign>"], ["<If>"], ["<Return>"],
+                  ["<Print>"], ["<Scan>"], ["<While>"]],
+    "Compound": [["{", "<Statement List>", "}"]],
+    "Assign": [["Identifier", "@assign_target", "=", "<Expression>", ";", "@assign"]],
+    "If": [["if", "(", "<Condition>", ")", "<Statement>", "<If Tail>"]],
+    "If Tail": [["@else", "else", "<Statement>", "@end_else", "fi"], ["@end_if", "fi"]],
+    "Return": [["return", "<Return Tail>"]],
+    "Return Tail": [[";"], ["<Expression>", ";"]],
+    "Print": [["put", "(", "<Expression>", ")", ";", "@stdout"]],
+    "Scan": [["get", "(", "<Scan IDs>", ")", ";"]],
+    "Scan IDs": [["Identifier", "@get", "<Scan IDs Tail>"]],
+    "Scan IDs Tail": [[",", "<Scan IDs>"], []],
+    "While": [["while", "@label", "(", "<Condition>", ")", "<Statement>", "@loop"]],
+    "Condition": [["<Expression>", "<Relop>", "<Expression>", "@compare"]],
+    "Relop": [[op, "@relop"] for op in ("==", "!=", ">", "<", "<=", ">=", "=>")],
+    "Expression": [["<Term>", "<Expression Prime>"]],
+    "Expression Prime": [["+", "<Term>", "@add", "<Expression Prime>"],
+                         ["-", "<Term>", "@sub", "<Expression Prime>"], []],
+    "Term": [["<Factor>", "<Term Prime>"]],
+    "Term Prime": [["*", "<Factor>", "@mul", "<Term Prime>"],
+                   ["/", "<Factor>", "@div", "<Term Prime>"], []],
+    "Factor": [["-", "<Primary>", "@negate"], ["<Primary>"]],
+    "Primary": [["Identifier", "@pushm"], ["Integer", "@pushi"], ["(", "<Expression>", ")"],
+                ["true", "@push_true"], ["false", "@push_false"]],
+}
+START = "Rat25F"
+END = "EOF"  # terminal for the end of the token stream
+
+# Token types matched by type; every other token is matched by its lexeme
+TYPED_TERMINALS = frozenset(["Identifier", "Integer", "EOF"])
+
+RELOP_CODES = {"<": "LES", ">": "GRT", "==": "EQU", "!=": "NEQ", "<=": "LEQ", ">=": "GEQ", "=>": "GEQ"}
+
+
+def is_nonterminal(symbol):
+    return symbol.startswith("<") and symbol.endswith(">") and len(symbol) > 2
+
+
+def is_action(symbol):
+    return symbol.startswith("@") and len(symbol) > 1
+
+
+def first_sets(grammar):
+    """FIRST set per nonterminal; None in a set stands for ε"""
+    first = {name: set() for name in grammar}
+    changed = True
+    while changed:
+        changed = False
+        for name, alternatives in grammar.items():
+            for alternative in alternatives:
+                symbols = first_of(alternative, first)
+                if not symbols <= first[name]:
+                    first[name] |= symbols
+                    changed = True
+    return first
+
+
+def first_of(symbols, first):
+    """FIRST set of a symbol sequence (None if it can derive ε)"""
+    result = set()
+    for symbol in symbols:
+        if is_action(symbol):
+            continue
+        if not is_nonterminal(symbol):
+            result.add(symbol)
+            return result
+        result |= first[symbol[1:-1]] - {None}
+        if None not in first[symbol[1:-1]]:
+            return result
+    result.add(None)
+    return result
+
+
+def follow_sets(grammar, first, start=START):
+    follow = {name: set() for name in grammar}
+    follow[start].add(END)
+    changed = True
+    while changed:
+        changed = False
+        for name, alternatives in grammar.items():
+            for alternative in alternatives:
+                for i, symbol in enumerate(alternative):
+                    if not is_nonterminal(symbol):
+                        continue
+                    rest = first_of(alternative[i + 1:], first)
+                    symbols = rest - {None}
+                    if None in rest:
+                        symbols |= follow[name]
+                    target = follow[symbol[1:-1]]
+                    if not symbols <= target:
+                        target |= symbols
+                        changed = True
+    return follow
+
+
+class Rule(dict):
+    """A nonterminal on the parse stack: lookahead terminal -> right-hand side"""
+    def __init__(self, name):
+        super().__init__()
+        self.name = name
+
+
+def build_table(grammar, start=START, flatten=False):
+    """
+    Build the LL(1) parse table as one Rule per nonterminal.
+    Each entry holds (production text, symbols to push) with the symbols
+    already reversed and resolved: terminals stay strings, nonterminals
+    become their Rule and actions become LL1Analyzer methods.
+    With flatten=True every leading nonterminal of an entry is expanded
+    in place for the same lookahead, so e.g. <Expression> on an Integer
+    pushes "Integer @pushi <Term Prime> <Expression Prime>" in one step.
+    The result parses identically but drops the per-production trace text.
+    Raises an exception if the grammar is not LL(1).
+    """
+    first = first_sets(grammar)
+    follow = follow_sets(grammar, first, start)
+    table = {name: {} for name in grammar}  # name -> terminal -> alternative
+    for name, alternatives in grammar.items():
+        for alternative in alternatives:
+            lookaheads = first_of(alternative, first)
+            if None in lookaheads:
+                lookaheads = (lookaheads - {None}) | follow[name]
+            for terminal in lookaheads:
+                if terminal in table[name]:
+                    raise Exception(f"Error: Grammar is not LL(1): <{name}> on '{terminal}'")
+                table[name][terminal] = alternative
+
+    rules = {name: Rule(name) for name in grammar}
+
+    def resolve(symbol):
+        if is_nonterminal(symbol):
+            return rules[symbol[1:-1]]
+        if is_action(symbol):
+            return getattr(LL1Analyzer, "action_" + symbol[1:])
+        return symbol
+
+    def expand(alternative, terminal):
+        symbols = list(alternative)
+        for i, symbol in enumerate(symbols):
+            if is_action(symbol):
+                continue
+            if is_nonterminal(symbol) and terminal in table[symbol[1:-1]]:
+                return symbols[:i] + expand(table[symbol[1:-1]][terminal], terminal) + symbols[i + 1:]
+            break
+        return symbols
+
+    for name, entries in table.items():
+        for terminal, alternative in entries.items():
+            shown = [symbol for symbol in alternative if not is_action(symbol)]
+            text = f"{name}> ::= {' '.join(shown) if shown else 'ε'}"
+            if flatten:
+                alternative = expand(alternative, terminal)
+            rules[name][terminal] = (text, tuple(resolve(symbol) for symbol in reversed(alternative)))
+    return rules[start]
+
+
+class LL1Analyzer:
+    """
+    Table-driven LL(1) parser for simplified Rat25F.
+    Parsing is driven by the table built from GRAMMAR with an explicit
+    stack of terminals, Rules (nonterminals) and semantic actions, so there
+    is no Python call per production. The actions generate the same code
+    into the InstructionTable and the same SymbolTable as SyntaxAnalyzer.
+
+    trace, writer and compact work as in SyntaxAnalyzer; the production
+    trace lists the LL(1) productions of GRAMMAR, so it is not identical to
+    the recursive descent trace. Block scopes and error recovery are only
+    available in SyntaxAnalyzer.
+    """
+    TABLE = None       # start Rule, built on first use
+    FLAT_TABLE = None  # flattened table, used when no production trace is wanted
+
+    def __init__(self, tokens, trace=TRACE_FULL, writer=None, compact=False):
+        if LL1Analyzer.TABLE is None:
+            LL1Analyzer.TABLE = build_table(GRAMMAR)
+            LL1Analyzer.FLAT_TABLE = build_table(GRAMMAR, flatten=True)
+        self.tokens = iter(tokens)
+        self.current_index = 0
+        self.current_token = next(self.tokens, ("EOF", ""))
+        self.output = []
+        self.trace = trace
+        if writer is None:
+            self.emit = self.output.append
+        else:
+            self.emit = lambda line: writer.write(line + "\n")
+
+        self.symbol_table = SymbolTable()
+        self.instruction_table = InstructionTable(compact)
+        self.jump_stack = []   # JUMPZ addresses for back-patching
+        self.value_stack = []  # assignment targets, relops, LABEL and else JUMP addresses
+        self.lexeme = None     # lexeme of the last matched terminal
+        self.var_type = None   # qualifier of the declaration being parsed
+
+    def error(self, expected):
+        """Report syntax error"""
+        token_type, lexeme = self.current_token
+        raise SyntaxError(
+            f"Expected {expected}, but found {token_type}: '{lexeme}' at token position {self.current_index}")
+
+    def back_patch(self, jump_addr):
+        addr = self.jump_stack.pop() if self.jump_stack else None
+        if addr:
+            self.instruction_table.update_instruction(addr, jump_addr)
+
+    def check_declared(self, identifier):
+        if not self.symbol_table.lookup(identifier):
+            raise Exception(f"Error: Identifier '{identifier}' not declared")
+
+    # Semantic actions, named after the @action symbols in GRAMMAR
+    def action_qualifier(self):
+        self.var_type = self.lexeme
+
+    def action_declare(self):
+        self.symbol_table.insert(self.lexeme, self.var_type)
+
+    def action_assign_target(self):
+        self.check_declared(self.lexeme)
+        self.value_stack.append(self.lexeme)
+
+    def action_assign(self):
+        self.instruction_table.gen_instr("POPM", self.symbol_table.get_address(self.value_stack.pop()))
+
+    def action_get(self):
+        self.check_declared(self.lexeme)
+        self.instruction_table.gen_instr("STDIN", None)
+        self.instruction_table.gen_instr("POPM", self.symbol_table.get_address(self.lexeme))
+
+    def action_stdout(self):
+        self.instruction_table.gen_instr("STDOUT", None)
+
+    def action_else(self):
+        jump_addr = self.instruction_table.gen_instr("JUMP", None)
+        self.back_patch(self.instruction_table.instr_address)
+        self.value_stack.append(jump_addr)
+
+    def action_end_else(self):
+        self.instruction_table.update_instruction(self.value_stack.pop(), self.instruction_table.instr_address)
+
+    def action_end_if(self):
+        self.back_patch(self.instruction_table.instr_address)
+
+    def action_label(self):
+        self.value_stack.append(self.instruction_table.gen_instr("LABEL", None))
+
+    def action_loop(self):
+        self.instruction_table.gen_instr("JUMP", self.value_stack.pop())
+        self.back_patch(self.instruction_table.instr_address)
+
+    def action_relop(self):
+        self.value_stack.append(self.lexeme)
+
+    def action_compare(self):
+        self.instruction_table.gen_instr(RELOP_CODES[self.value_stack.pop()], None)
+        self.jump_stack.append(self.instruction_table.instr_address)
+        self.instruction_table.gen_instr("JUMPZ", None)
+
+    def action_add(self):
+        self.instruction_table.gen_instr("ADD", None)
+
+    def action_sub(self):
+        self.instruction_table.gen_instr("SUB", None)
+
+    def action_mul(self):
+        self.instruction_table.gen_instr("MUL", None)
+
+    def action_div(self):
+        self.instruction_table.gen_instr("DIV", None)
+
+    def action_negate(self):
+        self.instruction_table.gen_instr("PUSHI", -1)
+        self.instruction_table.gen_instr("MUL", None)
+
+    def action_pushm(self):
+        self.check_declared(self.lexeme)
+        self.instruction_table.gen_instr("PUSHM", self.symbol_table.get_address(self.lexeme))
+
+    def action_pushi(self):
+        self.instruction_table.gen_instr("PUSHI", int(self.lexeme))
+
+    def action_push_true(self):
+        self.instruction_table.gen_instr("PUSHI", 1)
+
+    def action_push_false(self):
+        self.instruction_table.gen_instr("PUSHI", 0)
+
+    def run(self):
+        """
+        The LL(1) driver loop.
+        The lookahead lives in locals while parsing; current_token and
+        current_index are written back before an error is raised.
+        """
+        trace_productions = self.trace >= TRACE_PRODUCTIONS
+        trace_tokens = self.trace >= TRACE_FULL
+        stack = [END, LL1Analyzer.TABLE if trace_productions else LL1Analyzer.FLAT_TABLE]
+        pop = stack.pop
+        push_all = stack.extend
+        tokens = self.tokens
+        emit = self.emit
+
+        token = self.current_token
+        index = self.current_index
+        token_type, lexeme = token
+        key = token_type if token_type in TYPED_TERMINALS else lexeme
+        try:
+            while stack:
+                symbol = pop()
+                kind = type(symbol)
+                if kind is Rule:
+                    # Nonterminal: expand by the table entry for the lookahead
+                    entry = symbol.get(key)
+                    if entry is None:
+                        self.current_token, self.current_index = token, index
+                        self.error(symbol.name)
+                    if trace_productions:
+                        emit(f"    <{entry[0]}")
+                    push_all(entry[1])
+                elif kind is str:
+                    # Terminal: must match the lookahead
+                    if symbol != key:
+                        if symbol == END:
+                            raise SyntaxError(f"Unexpected token after program end: {token}")
+                        self.current_token, self.current_index = token, index
+                        self.error(symbol)
+                    if symbol == END:
+                        break
+                    if trace_tokens:
+                        emit(f"Token: {token_type:<15} Lexeme: {lexeme}")
+                    self.lexeme = lexeme
+                    next_token = next(tokens, None)
+                    if next_token is not None:
+                        index += 1
+                        token = next_token
+                        token_type, lexeme = token
+                        key = token_type if token_type in TYPED_TERMINALS else lexeme
+                else:
+                    symbol(self)
+        finally:
+            self.current_token, self.current_index = token, index
+
+    def parse(self):
+        """Start parsing from the root. Returns (success, trace or [error])"""
+        try:
+            self.run()
+            return True, self.output
+        except (SyntaxError, Exception) as e:
+            return False, [str(e)]
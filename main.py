@@ -1,79 +1,396 @@
-from syntax import SyntaxAnalyzer
+import argparse
+import glob
+import mmap
+import os
+import re
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+from syntax import SyntaxAnalyzer, TRACE_FULL, TRACE_OFF, TRACE_PRODUCTIONS
 from lexer import LexicalAnalyzer
+from optimizer import PeepholeOptimizer
+from allocator import AddressAllocator
+from superinstructions import SuperinstructionFuser
+from cache import CompilationCache, CACHE_DIR, CACHE_MAX_BYTES, recording
+from profiling import CompileProfile
+import bytecode
+
+OUTPUT_BUFFER = 1024 * 1024  # Output files are written in large chunks
+TRACE_LEVELS = {"off": TRACE_OFF, "productions": TRACE_PRODUCTIONS, "full": TRACE_FULL}
+
+
+def output_name(input_file, out_dir=None):
+    """
+    Output file for an input file: tN.txt -> oN.txt, anything else
+    name.txt -> name_out.txt. Written next to the input unless out_dir is given.
+    """
+    directory, name = os.path.split(input_file)
+    stem = os.path.splitext(name)[0]
+    match = re.fullmatch(r"t(\d+)", stem)
+    name = f"o{match.group(1)}.txt" if match else f"{stem}_out.txt"
+    return os.path.join(out_dir if out_dir is not None else directory, name)
+
 
-def main():
+def token_position(source_code, index):
+    """
+    Line and column of token index in source_code, found by scanning it
+    again, or None when index is past the last token (EOF).
+    """
+    l_analyzer = LexicalAnalyzer()
+    scanner = l_analyzer.scan(source_code)
+    try:
+        for i, token in enumerate(scanner):
+            if i == index:
+                return l_analyzer.line, l_analyzer.column
+    finally:
+        # Release the scanner's export of an mmap buffer
+        scanner.close()
+    return None
+
+
+def profile_name(output_file):
+    """Profile written next to an output file: oN.txt -> oN.profile.json"""
+    return os.path.splitext(output_file)[0] + ".profile.json"
+
+
+def write_listing(f, trace_file, instruction_table, symbol_table):
+    """
+    Write a successful compile: syntax trace (copied from trace_file, or
+    left out when it is None), assembly code and symbol table.
     """
-    Main handler for running test cases.
-    Processes input files through:
+    f.write("Compilation Successful!\n")
+    f.write("=" * 50 + "\n\n")
+
+    # Write syntax analysis trace
+    if trace_file is not None:
+        f.write("SYNTAX ANALYSIS\n")
+        f.write("-" * 50 + "\n")
+        trace_file.seek(0)
+        shutil.copyfileobj(trace_file, f)
+        f.write("\n")
+
+    # Write assembly code
+    f.write("\n")
+    instruction_table.write_instructions(f)
+    f.write("\n")
+
+    # Write symbol table
+    symbol_table.write_table(f)
+
+
+def bytecode_name(output_file):
+    """Bytecode written next to an output file: oN.txt -> oN.r25b"""
+    return os.path.splitext(output_file)[0] + ".r25b"
+
+
+def compile_file(input_file, output_file, trace=TRACE_FULL, optimize=False, cache_dir=None, profile=False,
+                 use_mmap=False, write_bytecode=False, scoped=False, allocate=False, recover=False,
+                 fuse=False):
+    """
+    Compile one file through:
     1. Lexical analysis (removes comments, tokenizes)
     2. Syntax analysis with semantic actions (symbol table + code generation)
     3. Outputs results with syntax trace, assembly code, and symbol table
+    The syntax trace is streamed to a temporary file while parsing and is
+    left out entirely when trace is TRACE_OFF.
+    With optimize=True the generated code goes through the peephole
+    optimizer before it is written.
+    With a cache_dir, successful results are cached by source content and
+    a cache hit skips lexical and syntax analysis entirely.
+    With profile=True a CompileProfile (phase timings, production and token
+    counts, peak jump stack depth) is dumped next to the output file.
+    With use_mmap=True the source is memory-mapped and lexed in place
+    instead of being read into a string (a source with non-ASCII bytes is
+    lexed from a decoded copy, so the tokens match a plain read).
+    With write_bytecode=True the code and symbol table are also saved in
+    the binary format from bytecode.py (oN.r25b).
+    With scoped=True compound statements may open with block-local
+    declarations (see ScopedSymbolTable).
+    With allocate=True variables whose lifetimes never overlap are merged
+    into shared memory cells (see AddressAllocator).
+    With recover=True the parser recovers from errors and every error in
+    the file is written to the output, not just the first, each with its
+    line and column (the source is lexed into a TokenStore up front).
+    With fuse=True common instruction sequences are replaced by
+    superinstructions (see SuperinstructionFuser) as the last code pass.
+    Errors are contained per file.
+    Returns (success, messages, cache_status) with cache_status "hit",
+    "miss" or None when caching is off.
     """
-    input_files = ["t1.txt", "t2.txt", "t3.txt"]
-    output_files = ["o1.txt", "o2.txt", "o3.txt"]
-    
-    for input_file, output_file in zip(input_files, output_files):
-        try:
-            # Read source code
-            with open(input_file, "r") as f:
-                source_code = f.read()
-            
-            # Lexical Analysis
-            l_analyzer = LexicalAnalyzer()
-            source_code = l_analyzer.lex_comment(source_code)
-            tokens = []
-            index = 0
-            
-            while index < len(source_code):
-                if source_code[index].isspace():
-                    index += 1
-                    continue
-                
-                token_type, lexeme, index = l_analyzer.lexer(source_code, index)
-                if token_type:
-                    tokens.append((token_type, lexeme))
-
-            tokens.append(("EOF", ""))
-
-            # Syntax Analysis with Semantic Actions
-            s_analyzer = SyntaxAnalyzer(tokens)
-            success, output = s_analyzer.parse()
+    messages = []
+    cache_status = None
+    source_code = None
+    scanner = None
+    profile = CompileProfile() if profile else None
+    timer = profile.phase if profile else (lambda name: nullcontext())
+    try:
+        # Read source code
+        with timer("read"):
+            if use_mmap:
+                source_code = LexicalAnalyzer.open_source(input_file)
+            else:
+                with open(input_file, "r") as f:
+                    source_code = f.read()
+
+        with timer("cache"):
+            cache = CompilationCache(cache_dir) if cache_dir else None
+            key = cache.key(source_code, trace, optimize, scoped, allocate, fuse) if cache else None
+            entry = cache.get(key) if cache else None
+
+        with tempfile.TemporaryFile("w+") as trace_file, open(output_file, "w", buffering=OUTPUT_BUFFER) as f:
+            report = None
+            allocation = None
+            fusion = None
+            if entry is not None:
+                # Cache hit: reuse the stored tables and trace
+                cache_status = "hit"
+                success = True
+                instruction_table, symbol_table = cache.restore(entry)
+                trace_file.write(entry["trace"])
+                report = entry["report"]
+                allocation = entry.get("allocation")
+                fusion = entry.get("fusion")
+            else:
+                # Lexical Analysis
+                l_analyzer = LexicalAnalyzer()
+                if recover:
+                    # Lex up front into a TokenStore so every error gets a line and column
+                    with timer("lex"):
+                        tokens = l_analyzer.store(source_code)
+                    if profile:
+                        profile.token_types.update(tokens.type_names())
+                    if cache:
+                        cache_status = "miss"
+                        token_log = list(tokens)
+                else:
+                    scanner = tokens = l_analyzer.tokens(source_code)
+                    if profile:
+                        tokens = profile.tokens(tokens)
+                    if cache:
+                        cache_status = "miss"
+                        token_log = []
+                        tokens = recording(tokens, token_log)
+
+                # Syntax Analysis with Semantic Actions (consumes tokens lazily)
+                s_analyzer = SyntaxAnalyzer(tokens, trace, trace_file, profile=profile, scoped=scoped,
+                                            recover=recover)
+                with timer("parse"):
+                    success, output = s_analyzer.parse()
+                if profile and not recover:
+                    # Tokens are lexed lazily while parsing; keep the phases apart
+                    profile.phases["parse"] -= profile.phases.get("lex", 0.0)
+                instruction_table = s_analyzer.instruction_table
+                symbol_table = s_analyzer.symbol_table
+
+                # Optional peephole optimization between parsing and output
+                if success and optimize:
+                    with timer("optimize"):
+                        optimizer = PeepholeOptimizer()
+                        instruction_table = optimizer.optimize(instruction_table)
+                        report = optimizer.report
+
+                # Optional memory allocation pass over the final code
+                if success and allocate:
+                    with timer("allocate"):
+                        allocator = AddressAllocator()
+                        instruction_table, symbol_table = allocator.allocate(instruction_table, symbol_table)
+                        allocation = allocator.report
+
+                # Optional superinstruction fusion, last since it changes the instruction set
+                if success and fuse:
+                    with timer("fuse"):
+                        fuser = SuperinstructionFuser()
+                        instruction_table = fuser.fuse(instruction_table)
+                        fusion = fuser.report
+
+                if success and cache:
+                    with timer("cache"):
+                        trace_file.seek(0)
+                        cache.put(key, cache.make_entry(
+                            token_log, instruction_table, symbol_table, trace_file.read(), report, allocation, fusion))
+
+            if report is not None:
+                messages.append(f"  Optimized {input_file}: removed {report['removed']} of {report['before']} instructions")
+            if allocation is not None:
+                messages.append(f"  Allocated {input_file}: {allocation['after']} of {allocation['before']} memory cells"
+                                f" (saved {allocation['saved']})")
+            if fusion is not None:
+                messages.append(f"  Fused {input_file}: {fusion['after']} of {fusion['before']} instructions"
+                                f" after superinstructions")
 
             # Write output
-            with open(output_file, "w") as f:
-                if success:
-                    f.write("Compilation Successful!\n")
-                    f.write("=" * 50 + "\n\n")
-                    
-                    # Write syntax analysis trace
-                    f.write("SYNTAX ANALYSIS\n")
-                    f.write("-" * 50 + "\n")
-                    for line in output:
-                        f.write(line + "\n")
-                    f.write("\n")
-                    
-                    # Write assembly code
-                    f.write("\n")
-                    for line in s_analyzer.instruction_table.print_instructions():
-                        f.write(line + "\n")
-                    f.write("\n")
-                    
-                    # Write symbol table
-                    for line in s_analyzer.symbol_table.print_table():
-                        f.write(line + "\n")
-                    
-                    print(f"✓ Success! Output written to {output_file}")
+            if success:
+                with timer("output"):
+                    write_listing(f, trace_file if trace != TRACE_OFF else None,
+                                  instruction_table, symbol_table)
+                if write_bytecode:
+                    with timer("bytecode"), open(bytecode_name(output_file), "wb") as bf:
+                        bytecode.dump(instruction_table, symbol_table, bf)
+                messages.append(f"✓ Success! Output written to {output_file}")
+            else:
+                f.write("Compilation Failed!\n")
+                f.write("=" * 50 + "\n\n")
+                for line in output:
+                    f.write(line + "\n")
+                if recover:
+                    messages.append(f"✗ {len(output)} error{'s' if len(output) != 1 else ''} found in {input_file}. Check {output_file} for details.")
                 else:
-                    f.write("Compilation Failed!\n")
-                    f.write("=" * 50 + "\n\n")
-                    for line in output:
-                        f.write(line + "\n")
-                    print(f"✗ Error found in {input_file}. Check {output_file} for details.")
+                    position = token_position(source_code, s_analyzer.error_index)
+                    if position is None:
+                        f.write("Near end of input\n")
+                    else:
+                        f.write(f"Near line {position[0]}, column {position[1]}\n")
+                    messages.append(f"✗ Error found in {input_file}. Check {output_file} for details.")
+        if profile:
+            profile.dump(profile_name(output_file))
+        return success, messages, cache_status
+
+    except FileNotFoundError:
+        messages.append(f"✗ Error: Could not find {input_file}")
+    except Exception as e:
+        messages.append(f"✗ Error processing {input_file}: {str(e)}")
+    finally:
+        if isinstance(source_code, mmap.mmap):
+            # A parse that stopped early leaves the scanner suspended with an
+            # export of the mmap's buffer; close it so the mmap can be closed
+            if scanner is not None:
+                scanner.close()
+            source_code.close()
+    return False, messages, cache_status
+
+
+def _compile_job(job):
+    """Process-pool entry point: job is compile_file's argument tuple"""
+    return compile_file(*job)
+
+
+def expand_inputs(paths, pattern):
+    """
+    Expand globs and directories (files matching pattern) into a sorted file list.
+    Returns (files, empty) with empty the globs and directories that matched nothing.
+    """
+    files = []
+    empty = []
+    for path in paths:
+        if os.path.isdir(path):
+            matched = sorted(glob.glob(os.path.join(path, pattern)))
+        elif glob.has_magic(path):
+            matched = sorted(glob.glob(path))
+        else:
+            matched = [path]
+        if not matched:
+            empty.append(path)
+        files.extend(matched)
+    # Keep first occurrence of each file
+    return list(dict.fromkeys(files)), empty
+
+
+def output_collisions(input_files, output_files):
+    """(earlier input, input, output file) for each input whose output an earlier input already writes"""
+    writers = {}
+    collisions = []
+    for input_file, output_file in zip(input_files, output_files):
+        key = os.path.normcase(os.path.abspath(output_file))
+        if key in writers:
+            collisions.append((writers[key], input_file, output_file))
+        else:
+            writers[key] = input_file
+    return collisions
+
+
+def main(argv=None):
+    """
+    Batch compiler driver.
+    With no paths, compiles the test cases t1.txt, t2.txt, t3.txt into
+    o1.txt, o2.txt, o3.txt. Otherwise compiles every file matched by the
+    given globs/directories, using a process pool of --jobs workers.
+    Returns 0 when every file compiled, 1 otherwise. Nothing is compiled
+    (and 1 is returned) when a glob or directory matches no files or two
+    inputs would write the same output file.
+    """
+    parser = argparse.ArgumentParser(description="Rat25F compiler")
+    parser.add_argument("paths", nargs="*", help="source files, globs or directories")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes (default: CPU count)")
+    parser.add_argument("--pattern", default="t*.txt",
+                        help="file pattern used inside directories (default: t*.txt)")
+    parser.add_argument("-o", "--out-dir", help="directory for output files (default: next to input)")
+    parser.add_argument("--trace", choices=TRACE_LEVELS, default="full", help="syntax trace level")
+    parser.add_argument("-O", "--optimize", action="store_true", help="run the peephole optimizer")
+    parser.add_argument("--cache", action="store_true", help=f"cache results in {CACHE_DIR}")
+    parser.add_argument("--cache-dir", help="cache results in this directory (implies --cache)")
+    parser.add_argument("--profile", action="store_true",
+                        help="write a JSON compile profile next to each output (oN.profile.json)")
+    parser.add_argument("--mmap", action="store_true",
+                        help="memory-map sources and lex them in place (for very large files)")
+    parser.add_argument("--bytecode", action="store_true",
+                        help="also write binary bytecode next to each output (oN.r25b)")
+    parser.add_argument("--scoped", action="store_true",
+                        help="allow block-local declarations at the start of compound statements")
+    parser.add_argument("--allocate", action="store_true",
+                        help="share memory cells between variables whose lifetimes never overlap")
+    parser.add_argument("--recover", action="store_true",
+                        help="recover from syntax errors and report every error in one pass")
+    parser.add_argument("--fuse", action="store_true",
+                        help="fuse common instruction sequences into superinstructions (INCM, ADDMM, LESJZ, ...)")
+    parser.add_argument("--cache-size", type=int, default=CACHE_MAX_BYTES // (1024 * 1024),
+                        help="cache size limit in MB (default: %(default)s)")
+    args = parser.parse_args(argv)
+    cache_dir = args.cache_dir or (CACHE_DIR if args.cache else None)
+
+    if args.paths:
+        input_files, empty = expand_inputs(args.paths, args.pattern)
+    else:
+        input_files, empty = ["t1.txt", "t2.txt", "t3.txt"], []
+    output_files = [output_name(input_file, args.out_dir) for input_file in input_files]
+    collisions = output_collisions(input_files, output_files)
+    for path in empty:
+        print(f"Error: No files match '{path}'")
+    for earlier, input_file, output_file in collisions:
+        print(f"Error: {earlier} and {input_file} would both be written to {output_file}")
+    if empty or collisions:
+        return 1
+
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+    jobs = [(input_file, output_file, TRACE_LEVELS[args.trace], args.optimize, cache_dir,
+             args.profile, args.mmap, args.bytecode, args.scoped, args.allocate, args.recover,
+             args.fuse)
+            for input_file, output_file in zip(input_files, output_files)]
+
+    if args.jobs > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            results = executor.map(_compile_job, jobs, chunksize=max(1, len(jobs) // (args.jobs * 4)))
+            failed, cache_counts = report_results(results)
+    else:
+        failed, cache_counts = report_results(map(_compile_job, jobs))
+
+    print(f"\nCompiled {len(jobs) - failed} of {len(jobs)} files, {failed} failed")
+    if cache_dir:
+        evicted = CompilationCache(cache_dir, args.cache_size * 1024 * 1024).evict()
+        print(f"Cache: {cache_counts['hit']} hits, {cache_counts['miss']} misses, {evicted} evicted")
+    return 1 if failed else 0
+
+
+def report_results(results):
+    """
+    Print each file's messages in input order.
+    Returns the failure count and cache hit/miss counts.
+    """
+    failed = 0
+    cache_counts = {"hit": 0, "miss": 0}
+    for success, messages, cache_status in results:
+        for message in messages:
+            print(message)
+        if not success:
+            failed += 1
+        if cache_status:
+            cache_counts[cache_status] += 1
+    return failed, cache_counts
 
-        except FileNotFoundError:
-            print(f"✗ Error: Could not find {input_file}")
-        except Exception as e:
-            print(f"✗ Error processing {input_file}: {str(e)}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
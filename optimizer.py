@@ -0,0 +1,173 @@
+from instruction_table import InstructionTable, JUMPS
+from vm import int_div
+
+# Binary instructions that can be evaluated at compile time (None = don't fold)
+FOLD = {
+    'ADD': lambda a, b: a + b,
+    'SUB': lambda a, b: a - b,
+    'MUL': lambda a, b: a * b,
+    'DIV': lambda a, b: int_div(a, b) if b != 0 else None,
+    'GRT': lambda a, b: 1 if a > b else 0,
+    'LES': lambda a, b: 1 if a < b else 0,
+    'EQU': lambda a, b: 1 if a == b else 0,
+    'NEQ': lambda a, b: 1 if a != b else 0,
+    'GEQ': lambda a, b: 1 if a >= b else 0,
+    'LEQ': lambda a, b: 1 if a <= b else 0,
+}
+
+
+class PeepholeOptimizer:
+    """
+    Peephole optimizer over the code in an InstructionTable.
+    Passes, repeated until the code stops shrinking:
+    - constant folding: PUSHI a; PUSHI b; <op>  ->  PUSHI (a op b)
+      (this also turns the unary minus sequence PUSHI n; PUSHI -1; MUL
+      into PUSHI -n)
+    - constant branches: PUSHI 0; JUMPZ t  ->  JUMP t, and PUSHI k; JUMPZ t
+      is removed for k != 0
+    - jump threading: a jump whose target is a JUMP goes to its final target
+    - a JUMP to the very next instruction is removed
+    - unreachable code (e.g. after an unconditional JUMP) is removed
+    - LABEL no-ops are removed when strip_labels is set
+    Jump operands are renumbered after each pass.
+    self.report counts what each pass changed, plus before/after sizes.
+    """
+    def __init__(self, strip_labels=False):
+        self.strip_labels = strip_labels
+        self.compact = False
+        self.report = {}
+
+    def optimize(self, instruction_table):
+        """Return a new, optimized InstructionTable (same layout as the input)"""
+        code = [[op, operand] for address, op, operand in instruction_table.rows()]
+        self.compact = instruction_table.compact
+        self.report = {
+            'before': len(code),
+            'folded': 0,
+            'branches_folded': 0,
+            'jumps_threaded': 0,
+            'jumps_removed': 0,
+            'dead_removed': 0,
+            'labels_removed': 0,
+        }
+
+        while True:
+            size = len(code)
+            code = self.fold_constants(code)
+            self.thread_jumps(code)
+            code = self.remove_jumps_to_next(code)
+            code = self.remove_unreachable(code)
+            if self.strip_labels:
+                code = self.remove_labels(code)
+            if len(code) == size:
+                break
+
+        table = InstructionTable(instruction_table.compact)
+        for op, operand in code:
+            table.gen_instr(op, operand)
+
+        self.report['after'] = len(code)
+        self.report['removed'] = self.report['before'] - len(code)
+        return table
+
+    def jump_targets(self, code):
+        """0-based indexes of every instruction some jump lands on"""
+        return {operand - 1 for op, operand in code if op in JUMPS and operand is not None}
+
+    def rebuild(self, code, keep):
+        """
+        Drop instructions whose keep flag is False and renumber jumps.
+        A jump to a removed instruction lands on the next kept one.
+        """
+        new_address = []
+        address = 1
+        for flag in keep:
+            new_address.append(address)
+            if flag:
+                address += 1
+        new_address.append(address)  # one past the end
+
+        result = []
+        for (op, operand), flag in zip(code, keep):
+            if flag:
+                if op in JUMPS and operand is not None:
+                    operand = new_address[operand - 1]
+                result.append([op, operand])
+        return result
+
+    def fold_constants(self, code):
+        targets = self.jump_targets(code)
+        keep = [True] * len(code)
+        kept = []  # indexes of kept instructions, in order
+
+        for i, (op, operand) in enumerate(code):
+            if op in FOLD and i not in targets and len(kept) >= 2:
+                a, b = kept[-2], kept[-1]
+                if code[a][0] == 'PUSHI' and code[b][0] == 'PUSHI' and b not in targets:
+                    value = FOLD[op](code[a][1], code[b][1])
+                    if value is not None and (not self.compact or -2 ** 31 < value < 2 ** 31):
+                        code[a][1] = value
+                        keep[b] = keep[i] = False
+                        kept.pop()
+                        self.report['folded'] += 2
+                        continue
+
+            if op == 'JUMPZ' and operand is not None and i not in targets and kept:
+                p = kept[-1]
+                if code[p][0] == 'PUSHI':
+                    if code[p][1] == 0:
+                        code[p] = ['JUMP', operand]
+                        keep[i] = False
+                    else:
+                        keep[p] = keep[i] = False
+                        kept.pop()
+                    self.report['branches_folded'] += 1
+                    continue
+            kept.append(i)
+
+        return self.rebuild(code, keep)
+
+    def thread_jumps(self, code):
+        count = len(code)
+        for instr in code:
+            op, target = instr
+            if op not in JUMPS or target is None:
+                continue
+            seen = set()
+            while 1 <= target <= count and target not in seen:
+                next_op, next_target = code[target - 1]
+                if next_op != 'JUMP' or next_target is None:
+                    break
+                seen.add(target)
+                target = next_target
+            if target != instr[1]:
+                instr[1] = target
+                self.report['jumps_threaded'] += 1
+
+    def remove_jumps_to_next(self, code):
+        keep = [not (op == 'JUMP' and operand == i + 2) for i, (op, operand) in enumerate(code)]
+        self.report['jumps_removed'] += keep.count(False)
+        return self.rebuild(code, keep)
+
+    def remove_unreachable(self, code):
+        count = len(code)
+        reachable = [False] * count
+        work = [0]
+        while work:
+            i = work.pop()
+            if i >= count or reachable[i]:
+                continue
+            reachable[i] = True
+            op, operand = code[i]
+            if op in JUMPS and operand is not None:
+                work.append(operand - 1)
+            if op != 'JUMP' or operand is None:
+                work.append(i + 1)
+
+        self.report['dead_removed'] += reachable.count(False)
+        return self.rebuild(code, reachable)
+
+    def remove_labels(self, code):
+        keep = [op != 'LABEL' for op, operand in code]
+        self.report['labels_removed'] += keep.count(False)
+        return self.rebuild(code, keep)
@@ -0,0 +1,68 @@
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+
+class CompileProfile:
+    """
+    Instrumentation for one compile:
+    - phases: seconds per compiler phase (lex, parse, optimize, output, ...)
+    - productions: call counts per production rule from print_production
+    - token_types: token counts per token type
+    - max_jump_stack: peak depth of the back-patching jump stack
+    Nothing here is touched unless a profile is passed in, so a disabled
+    profile costs nothing.
+    """
+    def __init__(self):
+        self.phases = {}
+        self.productions = Counter()
+        self.token_types = Counter()
+        self.max_jump_stack = 0
+
+    def add_time(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name):
+        """Time the body of a with-block as phase name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def tokens(self, tokens):
+        """
+        Pass a token stream through, counting tokens per type and timing
+        the time spent producing them as the 'lex' phase.
+        """
+        clock = time.perf_counter
+        counts = self.token_types
+        phases = self.phases
+        phases.setdefault("lex", 0.0)
+        it = iter(tokens)
+        while True:
+            start = clock()
+            token = next(it, None)
+            phases["lex"] += clock() - start
+            if token is None:
+                break
+            counts[token[0]] += 1
+            yield token
+
+    def to_dict(self):
+        phases = {name: round(seconds, 6) for name, seconds in self.phases.items()}
+        return {
+            "phases": phases,
+            "total_seconds": round(sum(self.phases.values()), 6),
+            "productions": dict(self.productions.most_common()),
+            "token_types": dict(self.token_types.most_common()),
+            "tokens": sum(self.token_types.values()),
+            "max_jump_stack": self.max_jump_stack,
+        }
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+            f.write("\n")
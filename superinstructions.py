@@ -0,0 +1,99 @@
+from instruction_table import InstructionTable, JUMPS
+
+# PUSHM a; PUSHM b; <op>  ->  <op>MM (a, b)
+MEMORY_OPS = {'ADD': 'ADDMM', 'SUB': 'SUBMM', 'MUL': 'MULMM', 'DIV': 'DIVMM'}
+# <compare>; JUMPZ t  ->  <compare>JZ t
+BRANCH_OPS = {'GRT': 'GRTJZ', 'LES': 'LESJZ', 'EQU': 'EQUJZ', 'NEQ': 'NEQJZ', 'GEQ': 'GEQJZ', 'LEQ': 'LEQJZ'}
+
+
+class SuperinstructionFuser:
+    """
+    Rewrites common instruction sequences in an InstructionTable into
+    single superinstructions, so the VM dispatches fewer instructions:
+    - INCM (a, k):   PUSHM a; PUSHI k; ADD; POPM a  (also k + a, and SUB
+      as INCM (a, -k)), i.e. a = a + k
+    - <op>MM (a, b): PUSHM a; PUSHM b; ADD/SUB/MUL/DIV, which pushes a op b
+    - <compare>JZ t: GRT/LES/EQU/NEQ/GEQ/LEQ; JUMPZ t, which pops both
+      sides and jumps to t when the comparison is false
+    Sequences are matched left to right, longest first, and never span a
+    jump target (except at their first instruction). Jump operands are
+    renumbered.
+    The fused code uses the ops and pair operands from instruction_table,
+    so it should run after the optimizer and allocator, which only know
+    the basic instructions.
+    self.report counts each superinstruction plus before/after sizes, and
+    self.origins gives, per new instruction, the address of the first
+    instruction it replaced.
+    """
+    def __init__(self):
+        self.compact = False
+        self.report = {}
+        self.origins = []
+
+    def fuse(self, instruction_table):
+        """Return a new InstructionTable with superinstructions (same layout as the input)"""
+        code = [(op, operand) for address, op, operand in instruction_table.rows()]
+        self.compact = instruction_table.compact
+        self.report = {'before': len(code)}
+        targets = {operand - 1 for op, operand in code if op in JUMPS and operand is not None}
+
+        fused = []
+        self.origins = []
+        new_address = [None] * (len(code) + 1)
+        i = 0
+        while i < len(code):
+            op, operand, size = self.match(code, i, targets)
+            new_address[i] = len(fused) + 1
+            fused.append((op, operand))
+            self.origins.append(i + 1)
+            if size > 1:
+                self.report[op] = self.report.get(op, 0) + 1
+            i += size
+        new_address[len(code)] = len(fused) + 1  # one past the end
+
+        table = InstructionTable(instruction_table.compact)
+        for op, operand in fused:
+            if op in JUMPS and operand is not None and 1 <= operand <= len(code) + 1:
+                operand = new_address[operand - 1]
+            table.gen_instr(op, operand)
+
+        self.report['after'] = len(fused)
+        self.report['removed'] = self.report['before'] - len(fused)
+        return table
+
+    def match(self, code, i, targets):
+        """(op, operand, instructions replaced) for the sequence starting at i"""
+        def window(size):
+            if i + size > len(code) or any(j in targets for j in range(i + 1, i + size)):
+                return None
+            return code[i:i + size]
+
+        sequence = window(4)
+        if sequence:
+            (op1, a), (op2, b), (op3, c), (op4, d) = sequence
+            if op3 in ('ADD', 'SUB') and op4 == 'POPM':
+                if op1 == 'PUSHM' and op2 == 'PUSHI' and a == d:
+                    k = b if op3 == 'ADD' else -b
+                    if self.fits(k):
+                        return 'INCM', (a, k), 4
+                if op1 == 'PUSHI' and op2 == 'PUSHM' and op3 == 'ADD' and b == d:
+                    return 'INCM', (b, a), 4
+
+        sequence = window(3)
+        if sequence:
+            (op1, a), (op2, b), (op3, c) = sequence
+            if op1 == 'PUSHM' and op2 == 'PUSHM' and op3 in MEMORY_OPS:
+                return MEMORY_OPS[op3], (a, b), 3
+
+        sequence = window(2)
+        if sequence:
+            (op1, a), (op2, b) = sequence
+            if op1 in BRANCH_OPS and op2 == 'JUMPZ' and b is not None:
+                return BRANCH_OPS[op1], b, 2
+
+        op, operand = code[i]
+        return op, operand, 1
+
+    def fits(self, k):
+        """A compact table can only hold a 32-bit second operand other than NIL"""
+        return not self.compact or -2 ** 31 < k < 2 ** 31
@@ -1,3 +1,6 @@
+from listing import write_lines
+
+
 class SymbolTable:
     """
     Symbol table handler with procedures for:
@@ -62,13 +65,102 @@ class SymbolTable:
         type2 = self.get_type(identifier2)
         return type1 == type2
     
+    def symbols(self):
+        """All declarations as (identifier, entry) pairs, in declaration order"""
+        return self.table.items()
+
+    @staticmethod
+    def from_symbols(symbols, memory_address):
+        """
+        Rebuild a table from symbols() pairs (e.g. a cache or bytecode file).
+        Identifiers declared more than once come back as a ScopedSymbolTable.
+        """
+        symbols = list(symbols)
+        if len({identifier for identifier, info in symbols}) == len(symbols):
+            symbol_table = SymbolTable()
+            symbol_table.table = dict(symbols)
+        else:
+            symbol_table = ScopedSymbolTable()
+            symbol_table.declared = symbols
+            symbol_table.max_address = max(info['memory_address'] for identifier, info in symbols) + 1
+        symbol_table.memory_address = memory_address
+        return symbol_table
+
+    def format_table(self):
+        """Yield listing lines for all identifiers in the table"""
+        yield "\nSymbol Table"
+        yield "=" * 50
+        yield f"{'Identifier':<20} {'MemoryLocation':<20} {'Type':<10}"
+        yield "-" * 50
+        for identifier, info in self.symbols():
+            yield f"{identifier:<20} {info['memory_address']:<20} {info['type']:<10}"
+
+    def write_table(self, f, chunk_size=4096):
+        """Stream the listing into file object f (see write_lines)"""
+        write_lines(f, self.format_table(), chunk_size)
+
     def print_table(self):
         """Print all identifiers in the table"""
-        output = []
-        output.append("\nSymbol Table")
-        output.append("=" * 50)
-        output.append(f"{'Identifier':<20} {'MemoryLocation':<20} {'Type':<10}")
-        output.append("-" * 50)
-        for identifier, info in self.table.items():
-            output.append(f"{identifier:<20} {info['memory_address']:<20} {info['type']:<10}")
-        return output
\ No newline at end of file
+        return list(self.format_table())
+
+
+class ScopedSymbolTable(SymbolTable):
+    """
+    Symbol table with nested block scopes.
+    - self.table maps each identifier to a stack of its visible entries,
+      innermost last, so lookup is O(1) however deep the nesting
+    - self.scopes holds, per open scope, the identifiers it declared and
+      the memory address where it started
+    exit_scope() pops the scope's entries and hands its addresses back, so
+    sibling blocks reuse the same memory locations.
+    self.declared keeps every declaration for the listing.
+    """
+    def __init__(self):
+        super().__init__()
+        self.scopes = [([], self.memory_address)]
+        self.declared = []
+        self.max_address = self.memory_address
+
+    def enter_scope(self):
+        self.scopes.append(([], self.memory_address))
+
+    def exit_scope(self):
+        names, start_address = self.scopes.pop()
+        for identifier in names:
+            stack = self.table[identifier]
+            stack.pop()
+            if not stack:
+                del self.table[identifier]
+        self.memory_address = start_address
+
+    def insert(self, identifier, var_type):
+        """
+        Insert identifier into the innermost scope.
+        Raises exception if it is already declared in that scope.
+        """
+        names = self.scopes[-1][0]
+        stack = self.table.setdefault(identifier, [])
+        depth = len(self.scopes)
+        if stack and stack[-1]['scope'] == depth:
+            raise Exception(f"Error: Identifier '{identifier}' already declared")
+
+        entry = {
+            'memory_address': self.memory_address,
+            'type': var_type,
+            'scope': depth
+        }
+        stack.append(entry)
+        names.append(identifier)
+        self.declared.append((identifier, entry))
+        current_address = self.memory_address
+        self.memory_address += 1
+        self.max_address = max(self.max_address, self.memory_address)
+        return current_address
+
+    def lookup(self, identifier):
+        """Innermost visible entry for identifier, None if not declared"""
+        stack = self.table.get(identifier)
+        return stack[-1] if stack else None
+
+    def symbols(self):
+        return self.declared
@@ -1,5 +1,34 @@
-from symbol_table import SymbolTable
+from symbol_table import SymbolTable, ScopedSymbolTable
 from instruction_table import InstructionTable
+from token_store import TokenStore, TYPE_CODES, TYPE_NAMES, IDENTIFIER, INTEGER, EOF
+
+# Syntax trace levels
+TRACE_OFF = 0          # no trace, no strings built
+TRACE_PRODUCTIONS = 1  # production rules only
+TRACE_FULL = 2         # production rules and matched tokens
+
+# Panic-mode recovery skips ahead to one of these lexemes
+SYNC_LEXEMES = (";", "}", "fi", "#")
+CLOSERS = {"if": "fi", "{": "}"}
+
+
+class DiscardedCode:
+    """
+    Stands in for the InstructionTable once an error has been seen:
+    addresses still advance so the parser's semantic actions run
+    unchanged, but no instructions are stored.
+    """
+    def __init__(self, instr_address):
+        self.instr_address = instr_address
+
+    def gen_instr(self, op, operand=None):
+        current_address = self.instr_address
+        self.instr_address += 1
+        return current_address
+
+    def update_instruction(self, address, operand):
+        pass
+
 
 class SyntaxAnalyzer:
     """
@@ -9,48 +38,235 @@ class SyntaxAnalyzer:
     - Semantic actions following partial solutions structure
     
     Simplified Rat25F: No functions, no real type, only integer and boolean
+
+    trace selects how much of the syntax trace is produced (TRACE_OFF,
+    TRACE_PRODUCTIONS or TRACE_FULL). Trace lines are collected in
+    self.output, or written straight to writer (any object with write())
+    when one is given. compact=True stores generated code in the
+    array-backed InstructionTable layout. A CompileProfile passed as
+    profile collects production counts and peak jump stack depth; without
+    one the counting methods are never installed. scoped=True allows
+    block-local declarations at the start of a compound statement, using
+    a ScopedSymbolTable. recover=True turns on panic-mode error recovery:
+    each error is recorded in self.errors, the parser skips ahead to a
+    synchronizing token (SYNC_LEXEMES) and carries on, and code
+    generation stops after the first error.
+
+    The lookahead is held as a small-int type code (see token_store) and
+    its lexeme, so matching compares integers. tokens may be a TokenStore,
+    whose codes are used as they are and whose source spans put a line and
+    column in every diagnostic; (token_type, lexeme) pairs from any other
+    iterable are converted as they are read.
     """
-    def __init__(self, tokens):
-        self.tokens = tokens
+    def __init__(self, tokens, trace=TRACE_FULL, writer=None, compact=False, profile=None, scoped=False,
+                 recover=False):
+        # Tokens may be a list or any iterable (e.g. LexicalAnalyzer.tokens);
+        # only the current lookahead token is held.
+        if isinstance(tokens, TokenStore):
+            self.store = tokens
+            self.tokens = tokens.pairs()
+        else:
+            self.store = None
+            self.tokens = ((TYPE_CODES[token_type], lexeme) for token_type, lexeme in tokens)
         self.current_index = 0
-        self.current_token = self.tokens[0] if self.tokens else None
+        self.current_code, self.current_lexeme = next(self.tokens, (EOF, ""))
         self.output = []
+        self.trace = trace
+        if writer is None:
+            self.emit = self.output.append
+        else:
+            self.emit = lambda line: writer.write(line + "\n")
         
         # Symbol table and instruction table
-        self.symbol_table = SymbolTable()
-        self.instruction_table = InstructionTable()
+        self.scoped = scoped
+        self.symbol_table = ScopedSymbolTable() if scoped else SymbolTable()
+        self.instruction_table = InstructionTable(compact)
         self.jump_stack = []  # For back-patching
 
+        self.profile = profile
+        if profile is not None:
+            self.print_production = self.print_production_profiled
+            self.push_jumpstack = self.push_jumpstack_profiled
+
+        self.recover = recover
+        self.errors = []
+        self.error_index = None  # token index of the last recorded error (the only one without recover)
+        self.owed_closers = []  # fi / } owed by the statements being parsed
+        self.generated_code = self.instruction_table
+        if recover:
+            self.statement = self.statement_recovering
+            self.statement_list = self.statement_list_recovering
+            self.declaration_item = self.declaration_item_recovering
+
     def lexer(self):
         """Move to next token (matches partial solutions naming)"""
-        if self.current_index < len(self.tokens) - 1:
+        next_token = next(self.tokens, None)
+        if next_token is not None:
             self.current_index += 1
-            self.current_token = self.tokens[self.current_index]
+            self.current_code, self.current_lexeme = next_token
+
+    @property
+    def current_token(self):
+        """The lookahead as a (token_type, lexeme) pair"""
+        return TYPE_NAMES[self.current_code], self.current_lexeme
 
     def match(self, expected):
-        """Match current token with expected token/lexeme"""
-        token_type, lexeme = self.current_token
+        """Match current token with expected lexeme or type code"""
+        lexeme = self.current_lexeme
 
-        if token_type == expected or lexeme == expected:
-            self.output.append(f"Token: {token_type:<15} Lexeme: {lexeme}")
-            matched_lexeme = lexeme
+        if lexeme == expected or self.current_code == expected:
+            if self.trace >= TRACE_FULL:
+                self.emit(f"Token: {TYPE_NAMES[self.current_code]:<15} Lexeme: {lexeme}")
             self.lexer()
-            return matched_lexeme
+            return lexeme
         return None
 
+    def position(self, index=None):
+        """
+        Where token index (default: the lookahead) is: line and column with
+        a TokenStore, else the token index itself.
+        """
+        if index is None:
+            index = self.current_index
+        if self.store is not None:
+            line, column = self.store.position(index)
+            return f"line {line}, column {column}"
+        return f"token position {index}"
+
     def error(self, expected):
         """Report syntax error"""
-        token_type, lexeme = self.current_token
         raise SyntaxError(
-            f"Expected {expected}, but found {token_type}: '{lexeme}' at token position {self.current_index}")
+            f"Expected {expected}, but found {TYPE_NAMES[self.current_code]}: "
+            f"'{self.current_lexeme}' at {self.position()}")
+
+    def error_token(self, error):
+        """Index of the token an error belongs to"""
+        if isinstance(error, SyntaxError):
+            return self.current_index
+        # Semantic errors are raised just after the identifier is matched
+        return max(self.current_index - 1, 0)
+
+    def report_error(self, error):
+        """
+        Record a diagnostic and switch code generation off after the first
+        one. A second error at the same token as the last one is dropped.
+        """
+        message = str(error)
+        index = self.error_token(error)
+        if not isinstance(error, SyntaxError):
+            message += f" at {self.position(index)}"
+        if index != self.error_index:
+            self.errors.append(message)
+            self.error_index = index
+        if not isinstance(self.instruction_table, DiscardedCode):
+            self.instruction_table = DiscardedCode(self.instruction_table.instr_address)
+
+    def skip_token(self):
+        """Advance past the current token; False at the end of the token stream"""
+        index = self.current_index
+        self.lexer()
+        return self.current_index != index
+
+    def synchronize(self, closers):
+        """
+        Skip the rest of a failed statement.
+        closers is the stack of fi / } still owed by the statement (and by
+        any if / { skipped on the way). Stops after the statement's ; or
+        last closer, or before a SYNC_LEXEMES token that belongs to an
+        enclosing construct, including a fi / } that an enclosing statement
+        is waiting for (self.owed_closers) when the failed statement's own
+        closer is missing.
+        """
+        while self.current_code != EOF:
+            lexeme = self.current_lexeme
+            if lexeme in SYNC_LEXEMES and not closers:
+                if lexeme == ";":
+                    self.skip_token()
+                return
+            if lexeme == "#":
+                return
+            if closers and lexeme == closers[-1]:
+                closers.pop()
+                self.skip_token()
+                if not closers:
+                    return
+                continue
+            if lexeme in self.owed_closers:
+                return
+            if lexeme in CLOSERS:
+                closers.append(CLOSERS[lexeme])
+            if not self.skip_token():
+                return
+
+    def statement_recovering(self):
+        """statement() that records an error and skips to the end of the statement"""
+        closer = CLOSERS.get(self.current_lexeme)
+        if closer is not None:
+            self.owed_closers.append(closer)
+        try:
+            SyntaxAnalyzer.statement(self)
+            error = None
+        except (SyntaxError, Exception) as e:
+            error = e
+        if closer is not None:
+            self.owed_closers.pop()
+        if error is not None:
+            self.report_error(error)
+            self.synchronize([closer] if closer is not None else [])
+
+    def statement_list_recovering(self):
+        """
+        statement_list() that also reports and skips each } or fi that no
+        enclosing statement is waiting for, then carries on with the list.
+        """
+        while True:
+            SyntaxAnalyzer.statement_list(self)
+            lexeme = self.current_lexeme
+            if lexeme not in ("}", "fi") or lexeme in self.owed_closers:
+                return
+            while lexeme in ("}", "fi") and lexeme not in self.owed_closers:
+                self.report_error(SyntaxError(
+                    f"Unexpected {TYPE_NAMES[self.current_code]}: '{lexeme}' with no matching opener "
+                    f"at {self.position()}"))
+                self.skip_token()
+                lexeme = self.current_lexeme
+            if not (self.current_code == IDENTIFIER or lexeme in self.STATEMENT_DISPATCH):
+                return
+
+    def declaration_item_recovering(self):
+        """
+        declaration_item() that records an error and resumes after the next ;
+        or at the next qualifier
+        """
+        try:
+            SyntaxAnalyzer.declaration_item(self)
+        except (SyntaxError, Exception) as e:
+            self.report_error(e)
+            while self.current_lexeme not in SYNC_LEXEMES and self.current_lexeme not in self.QUALIFIERS:
+                if not self.skip_token():
+                    return
+            if self.current_lexeme == ";":
+                self.skip_token()
 
     def print_production(self, rule):
         """Print production rule"""
-        self.output.append(f"    <{rule}")
+        if self.trace >= TRACE_PRODUCTIONS:
+            self.emit(f"    <{rule}")
     
+    def print_production_profiled(self, rule):
+        """print_production that also counts calls per rule"""
+        self.profile.productions[rule] += 1
+        SyntaxAnalyzer.print_production(self, rule)
+
     def push_jumpstack(self, address):
         """Push address onto jump stack for back-patching"""
         self.jump_stack.append(address)
+
+    def push_jumpstack_profiled(self, address):
+        """push_jumpstack that also tracks peak stack depth"""
+        self.jump_stack.append(address)
+        if len(self.jump_stack) > self.profile.max_jump_stack:
+            self.profile.max_jump_stack = len(self.jump_stack)
     
     def pop_jumpstack(self):
         """Pop address from jump stack"""
@@ -84,9 +300,7 @@ class SyntaxAnalyzer:
 
     # R10. <Opt Declaration List> ::= <Declaration List> | <Empty>
     def opt_declaration_list(self):
-        token_type, lexeme = self.current_token
-
-        if lexeme in ["integer", "boolean"]:
+        if self.current_lexeme in self.QUALIFIERS:
             self.print_production(
                 "Opt Declaration List> ::= <Declaration List>")
             self.declaration_list()
@@ -95,19 +309,24 @@ class SyntaxAnalyzer:
             self.empty()
 
     # R11. <Declaration List> ::= <Declaration> ; | <Declaration> ; <Declaration List>
+    # Right recursion is parsed as a loop so long lists don't grow the stack.
     def declaration_list(self):
-        self.print_production("Declaration List> ::= <Declaration> ;")
+        while True:
+            self.print_production("Declaration List> ::= <Declaration> ;")
+            self.declaration_item()
+
+            if self.current_lexeme not in self.QUALIFIERS:
+                break
+            self.print_production(
+                "Declaration List> ::= <Declaration> ; <Declaration List>")
+
+    # One "<Declaration> ;" of a declaration list
+    def declaration_item(self):
         self.declaration()
 
         if not self.match(";"):
             self.error(";")
 
-        token_type, lexeme = self.current_token
-        if lexeme in ["integer", "boolean"]:
-            self.print_production(
-                "Declaration List> ::= <Declaration> ; <Declaration List>")
-            self.declaration_list()
-
     # R12. <Declaration> ::= <Qualifier> <IDs>
     def declaration(self):
         self.print_production("Declaration> ::= <Qualifier> <IDs>")
@@ -117,98 +336,104 @@ class SyntaxAnalyzer:
     # R8. <Qualifier> ::= integer | boolean
     def qualifier(self):
         self.print_production("Qualifier> ::= integer | boolean")
-        token_type, lexeme = self.current_token
+        lexeme = self.current_lexeme
 
-        if lexeme in ["integer", "boolean"]:
+        if lexeme in self.QUALIFIERS:
             self.match(lexeme)
             return lexeme
         else:
             self.error("integer or boolean")
 
     # R13. <IDs> ::= <Identifier> | <Identifier>, <IDs>
+    # Parsed iteratively, one pass of the loop per identifier.
     def ids(self, var_type=None, is_declaration=False):
-        self.print_production("IDs> ::= <Identifier>")
-        token_type, lexeme = self.current_token
+        while True:
+            self.print_production("IDs> ::= <Identifier>")
+            lexeme = self.current_lexeme
 
-        if not self.match("Identifier"):
-            self.error("Identifier")
-        
-        if is_declaration:
-            # Semantic action: Insert into symbol table during declaration
-            self.symbol_table.insert(lexeme, var_type)
-        else:
-            # For get statements, verify identifier exists
-            if not self.symbol_table.lookup(lexeme):
-                raise Exception(f"Error: Identifier '{lexeme}' not declared")
-            # Semantic action: STDIN and POPM for get
-            self.instruction_table.gen_instr("STDIN", None)
-            addr = self.symbol_table.get_address(lexeme)
-            self.instruction_table.gen_instr("POPM", addr)
-
-        token_type, lexeme = self.current_token
-        if lexeme == ",":
+            if not self.match(IDENTIFIER):
+                self.error("Identifier")
+
+            if is_declaration:
+                # Semantic action: Insert into symbol table during declaration
+                self.symbol_table.insert(lexeme, var_type)
+            else:
+                # For get statements, verify identifier exists
+                if not self.symbol_table.lookup(lexeme):
+                    raise Exception(f"Error: Identifier '{lexeme}' not declared")
+                # Semantic action: STDIN and POPM for get
+                self.instruction_table.gen_instr("STDIN", None)
+                addr = self.symbol_table.get_address(lexeme)
+                self.instruction_table.gen_instr("POPM", addr)
+
+            lexeme = self.current_lexeme
+            if lexeme != ",":
+                break
             self.print_production("IDs> ::= <Identifier> , <IDs>")
             self.match(",")
-            self.ids(var_type, is_declaration)
 
     # R14. <Statement List> ::= <Statement> | <Statement> <Statement List>
+    # Parsed iteratively; stack depth only grows with compound/if/while nesting.
     def statement_list(self):
-        self.print_production("Statement List> ::= <Statement>")
-        self.statement()
+        while True:
+            self.print_production("Statement List> ::= <Statement>")
+            self.statement()
 
-        token_type, lexeme = self.current_token
-        if token_type == "Identifier" or lexeme in ["{", "if", "return", "put", "get", "while"]:
+            if not (self.current_code == IDENTIFIER or self.current_lexeme in self.STATEMENT_DISPATCH):
+                break
             self.print_production(
                 "Statement List> ::= <Statement> <Statement List>")
-            self.statement_list()
 
     # R15. <Statement> ::= <Compound> | <Assign> | <If> | <Return> | <Print> | <Scan> | <While>
+    # The production is picked from STATEMENT_DISPATCH (FIRST set -> handler).
     def statement(self):
-        token_type, lexeme = self.current_token
-
-        if lexeme == "{":
-            self.print_production("Statement> ::= <Compound>")
-            self.compound()
-        elif lexeme == "if":
-            self.print_production("Statement> ::= <If>")
-            self.if_statement()
-        elif lexeme == "return":
-            self.print_production("Statement> ::= <Return>")
-            self.return_statement()
-        elif lexeme == "put":
-            self.print_production("Statement> ::= <Print>")
-            self.print_statement()
-        elif lexeme == "get":
-            self.print_production("Statement> ::= <Scan>")
-            self.scan()
-        elif lexeme == "while":
-            self.print_production("Statement> ::= <While>")
-            self.while_statement()
-        elif token_type == "Identifier":
+        entry = self.STATEMENT_DISPATCH.get(self.current_lexeme)
+
+        if entry is not None:
+            rule, handler = entry
+            self.print_production(rule)
+            handler(self)
+        elif self.current_code == IDENTIFIER:
             self.print_production("Statement> ::= <Assign>")
             self.assign()
         else:
             self.error("Statement")
 
     # R16. <Compound> ::= { <Statement List> }
+    # With scoped=True: <Compound> ::= { <Declaration List> <Statement List> } is also
+    # accepted, and the block's declarations are only visible inside it.
     def compound(self):
         self.print_production("Compound> ::= { <Statement List> }")
 
         if not self.match("{"):
             self.error("{")
 
-        self.statement_list()
+        if self.scoped:
+            # Semantic action: open a block scope
+            self.symbol_table.enter_scope()
+        try:
+            if self.scoped and self.current_lexeme in self.QUALIFIERS:
+                self.print_production(
+                    "Compound> ::= { <Declaration List> <Statement List> }")
+                self.declaration_list()
 
-        if not self.match("}"):
-            self.error("}")
+            self.statement_list()
+
+            if not self.match("}"):
+                self.error("}")
+        finally:
+            if self.scoped:
+                # Semantic action: close the scope, releasing its addresses
+                # (also when the block fails to parse, so recovery resumes outside it)
+                self.symbol_table.exit_scope()
 
     # R17. <Assign> ::= <Identifier> = <Expression> ;
     # Following partial solutions A1: A -> id = E { gen_instr(POPM, get_address(id)) }
     def assign(self):
         self.print_production("Assign> ::= <Identifier> = <Expression> ;")
-        token_type, save = self.current_token
+        save = self.current_lexeme
 
-        if not self.match("Identifier"):
+        if not self.match(IDENTIFIER):
             self.error("Identifier")
         
         # Check if identifier is declared
@@ -245,7 +470,7 @@ class SyntaxAnalyzer:
 
         self.statement()
 
-        token_type, lexeme = self.current_token
+        lexeme = self.current_lexeme
         if lexeme == "else":
             self.print_production(
                 "If> ::= if ( <Condition> ) <Statement> else <Statement> fi")
@@ -276,7 +501,7 @@ class SyntaxAnalyzer:
         if not self.match("return"):
             self.error("return")
 
-        token_type, lexeme = self.current_token
+        lexeme = self.current_lexeme
         if lexeme != ";":
             self.print_production("Return> ::= return <Expression> ;")
             self.expression()
@@ -365,18 +590,7 @@ class SyntaxAnalyzer:
         self.expression()
         
         # Semantic actions: generate comparison instruction
-        if op == "<":
-            self.instruction_table.gen_instr("LES", None)
-        elif op == ">":
-            self.instruction_table.gen_instr("GRT", None)
-        elif op == "==":
-            self.instruction_table.gen_instr("EQU", None)
-        elif op == "!=":
-            self.instruction_table.gen_instr("NEQ", None)
-        elif op == "<=":
-            self.instruction_table.gen_instr("LEQ", None)
-        elif op == ">=" or op == "=>":
-            self.instruction_table.gen_instr("GEQ", None)
+        self.instruction_table.gen_instr(self.RELOP_OPCODES[op], None)
         
         # Semantic action: push_jumpstack and gen_instr(JUMPZ, nil)
         self.push_jumpstack(self.instruction_table.instr_address)
@@ -385,9 +599,9 @@ class SyntaxAnalyzer:
     # R24. <Relop> ::= == | != | > | < | <= | =>
     def relop(self):
         self.print_production("Relop> ::= == | != | > | < | <= | =>")
-        token_type, lexeme = self.current_token
+        lexeme = self.current_lexeme
 
-        if lexeme in ["==", "!=", ">", "<", "<=", ">=", "=>"]:
+        if lexeme in self.RELOP_OPCODES:
             self.match(lexeme)
             return lexeme
         else:
@@ -402,26 +616,22 @@ class SyntaxAnalyzer:
 
     # R25'. <Expression Prime> ::= + <Term> <Expression Prime> | - <Term> <Expression Prime> | ε
     # Following partial solutions A3: E' -> + T { gen_instr(ADD, nil) } E'
+    # The tail call on E' is parsed as a loop.
     def expression_prime(self):
-        token_type, lexeme = self.current_token
+        entry = self.EXPRESSION_OPS.get(self.current_lexeme)
 
-        if lexeme in ["+", "-"]:
-            self.print_production(
-                "Expression Prime> ::= + <Term> <Expression Prime>" if lexeme == "+"
-                else "Expression Prime> ::= - <Term> <Expression Prime>")
-            op = lexeme
-            self.match(lexeme)
+        while entry is not None:
+            rule, opcode = entry
+            self.print_production(rule)
+            self.match(self.current_lexeme)
             self.term()
-            
+
             # Semantic action: gen_instr(ADD/SUB, nil)
-            if op == "+":
-                self.instruction_table.gen_instr("ADD", None)
-            else:
-                self.instruction_table.gen_instr("SUB", None)
-            
-            self.expression_prime()
-        else:
-            self.print_production("Expression Prime> ::= ε")
+            self.instruction_table.gen_instr(opcode, None)
+
+            entry = self.EXPRESSION_OPS.get(self.current_lexeme)
+
+        self.print_production("Expression Prime> ::= ε")
 
     # R26. <Term> ::= <Factor> <Term Prime>
     # Following partial solutions A5: T -> F T'
@@ -432,30 +642,26 @@ class SyntaxAnalyzer:
 
     # R26'. <Term Prime> ::= * <Factor> <Term Prime> | / <Factor> <Term Prime> | ε
     # Following partial solutions A6: T' -> *F { gen_instr(MUL, nil) } T'
+    # The tail call on T' is parsed as a loop.
     def term_prime(self):
-        token_type, lexeme = self.current_token
+        entry = self.TERM_OPS.get(self.current_lexeme)
 
-        if lexeme in ["*", "/"]:
-            self.print_production(
-                "Term Prime> ::= * <Factor> <Term Prime>" if lexeme == "*"
-                else "Term Prime> ::= / <Factor> <Term Prime>")
-            op = lexeme
-            self.match(lexeme)
+        while entry is not None:
+            rule, opcode = entry
+            self.print_production(rule)
+            self.match(self.current_lexeme)
             self.factor()
-            
+
             # Semantic action: gen_instr(MUL/DIV, nil)
-            if op == "*":
-                self.instruction_table.gen_instr("MUL", None)
-            else:
-                self.instruction_table.gen_instr("DIV", None)
-            
-            self.term_prime()
-        else:
-            self.print_production("Term Prime> ::= ε")
+            self.instruction_table.gen_instr(opcode, None)
+
+            entry = self.TERM_OPS.get(self.current_lexeme)
+
+        self.print_production("Term Prime> ::= ε")
 
     # R27. <Factor> ::= - <Primary> | <Primary>
     def factor(self):
-        token_type, lexeme = self.current_token
+        lexeme = self.current_lexeme
 
         if lexeme == "-":
             self.print_production("Factor> ::= - <Primary>")
@@ -471,12 +677,12 @@ class SyntaxAnalyzer:
     # R28. <Primary> ::= <Identifier> | <Integer> | ( <Expression> ) | true | false
     # Following partial solutions A8: F -> id { gen_instr(PUSHM, get_address(id)) }
     def primary(self):
-        token_type, lexeme = self.current_token
+        token_type, lexeme = self.current_code, self.current_lexeme
 
-        if token_type == "Identifier":
+        if token_type == IDENTIFIER:
             self.print_production("Primary> ::= <Identifier>")
             identifier = lexeme
-            self.match("Identifier")
+            self.match(IDENTIFIER)
             
             # Check if identifier is declared
             if not self.symbol_table.lookup(identifier):
@@ -486,10 +692,10 @@ class SyntaxAnalyzer:
             addr = self.symbol_table.get_address(identifier)
             self.instruction_table.gen_instr("PUSHM", addr)
 
-        elif token_type == "Integer":
+        elif token_type == INTEGER:
             self.print_production("Primary> ::= <Integer>")
             value = lexeme
-            self.match("Integer")
+            self.match(INTEGER)
             # Semantic action: gen_instr(PUSHI, integer_value)
             self.instruction_table.gen_instr("PUSHI", int(value))
             
@@ -519,18 +725,50 @@ class SyntaxAnalyzer:
     def empty(self):
         self.print_production("Empty> ::= ε")
 
+    # Dispatch tables, built once per class: FIRST set -> (production, handler)
+    # and operator -> opcode, so each decision is a single dict or set lookup.
+    QUALIFIERS = frozenset(["integer", "boolean"])
+    STATEMENT_DISPATCH = {
+        "{": ("Statement> ::= <Compound>", compound),
+        "if": ("Statement> ::= <If>", if_statement),
+        "return": ("Statement> ::= <Return>", return_statement),
+        "put": ("Statement> ::= <Print>", print_statement),
+        "get": ("Statement> ::= <Scan>", scan),
+        "while": ("Statement> ::= <While>", while_statement),
+    }
+    RELOP_OPCODES = {"<": "LES", ">": "GRT", "==": "EQU", "!=": "NEQ", "<=": "LEQ", ">=": "GEQ", "=>": "GEQ"}
+    EXPRESSION_OPS = {
+        "+": ("Expression Prime> ::= + <Term> <Expression Prime>", "ADD"),
+        "-": ("Expression Prime> ::= - <Term> <Expression Prime>", "SUB"),
+    }
+    TERM_OPS = {
+        "*": ("Term Prime> ::= * <Factor> <Term Prime>", "MUL"),
+        "/": ("Term Prime> ::= / <Factor> <Term Prime>", "DIV"),
+    }
+
     def parse(self):
-        """Start parsing from the root"""
+        """
+        Start parsing from the root.
+        Returns (True, trace) on success. On failure returns (False, errors):
+        the first error only, or every error found when recover is set.
+        """
         try:
             self.rat25f()
 
-            if self.current_token[0] != "EOF":
+            if self.current_code != EOF:
                 raise SyntaxError(
                     f"Unexpected token after program end: {self.current_token}")
-
-            return True, self.output
         except (SyntaxError, Exception) as e:
-            return False, [str(e)]
+            if not self.recover:
+                self.error_index = self.error_token(e)
+                return False, [str(e)]
+            self.report_error(e)
+
+        if self.errors:
+            # Keep the code generated before the first error
+            self.instruction_table = self.generated_code
+            return False, self.errors
+        return True, self.output
 
 
 if __name__ == "__main__":
@@ -0,0 +1,74 @@
+from array import array
+from bisect import bisect_right
+
+# Small-int token type codes (index = code)
+TYPE_NAMES = ("Identifier", "Keyword", "Integer", "Real", "Operator", "Separator", "EOF")
+TYPE_CODES = {name: code for code, name in enumerate(TYPE_NAMES)}
+IDENTIFIER, KEYWORD, INTEGER, REAL, OPERATOR, SEPARATOR, EOF = range(len(TYPE_NAMES))
+
+
+class TokenStore:
+    """
+    Compact storage for a whole token stream, one slot per token in
+    parallel arrays:
+    - types: type code (see TYPE_NAMES)
+    - lexemes: index into self.strings, where each distinct lexeme is
+      stored once (interned)
+    - starts / ends: source offsets of the lexeme
+    Iterating a store yields (token_type, lexeme) pairs like
+    LexicalAnalyzer.tokens(); pairs() yields (type code, lexeme) for the
+    parser. position() maps a token to its line and column in source.
+    """
+    def __init__(self, source=""):
+        self.source = source
+        self.types = array('B')
+        self.lexemes = array('I')
+        self.starts = array('q')
+        self.ends = array('q')
+        self.strings = []
+        self.string_index = {}
+        self.line_starts = None
+
+    def append(self, code, lexeme, start, end):
+        index = self.string_index.get(lexeme)
+        if index is None:
+            index = self.string_index[lexeme] = len(self.strings)
+            self.strings.append(lexeme)
+        self.types.append(code)
+        self.lexemes.append(index)
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, i):
+        return TYPE_NAMES[self.types[i]], self.strings[self.lexemes[i]]
+
+    def __iter__(self):
+        return zip(map(TYPE_NAMES.__getitem__, self.types), map(self.strings.__getitem__, self.lexemes))
+
+    def pairs(self):
+        """(type code, lexeme) for every token, in order"""
+        return zip(self.types, map(self.strings.__getitem__, self.lexemes))
+
+    def type_names(self):
+        return map(TYPE_NAMES.__getitem__, self.types)
+
+    def span(self, i):
+        return self.starts[i], self.ends[i]
+
+    def position(self, i):
+        """(line, column) of token i, both 1-based; columns count bytes for a bytes source"""
+        if self.line_starts is None:
+            newline = "\n" if isinstance(self.source, str) else b"\n"
+            starts = array('q', [0])
+            find = self.source.find
+            index = find(newline)
+            while index != -1:
+                starts.append(index + 1)
+                index = find(newline, index + 1)
+            self.line_starts = starts
+        offset = self.starts[i] if i < len(self.starts) else len(self.source)
+        line = bisect_right(self.line_starts, offset)
+        return line, offset - self.line_starts[line - 1] + 1
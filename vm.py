@@ -0,0 +1,277 @@
+import sys
+
+from instruction_table import JUMPS, PAIR_OPS
+
+MEMORY_BASE = 10000  # First address handed out by SymbolTable
+
+
+class VMError(Exception):
+    """Raised when a program cannot be loaded or cannot continue running"""
+
+
+def int_div(a, b):
+    """Integer division that truncates toward zero (b must be non-zero)"""
+    q = abs(a) // abs(b)
+    return -q if (a < 0) != (b < 0) else q
+
+
+class VirtualMachine:
+    """
+    Stack machine that executes the code in an InstructionTable.
+    - memory: dict keyed by SymbolTable addresses (10000, 10001, ...)
+    - stdin / stdout: injectable file-like objects used by STDIN / STDOUT
+    - max_steps: instruction-count budget, None for unlimited
+
+    Instructions are decoded once into (handler, operand) pairs, with jump
+    targets converted to list indexes, so the dispatch loop does no string
+    comparisons or address arithmetic per step.
+    """
+    def __init__(self, instruction_table, stdin=None, stdout=None, max_steps=None):
+        self.stdin = stdin if stdin is not None else sys.stdin
+        self.stdout = stdout if stdout is not None else sys.stdout
+        self.max_steps = max_steps
+        self.stack = []
+        self.memory = {}
+        self.pc = 0
+        self.steps = 0
+        self.handlers = self.build_handlers()
+        self.code = self.decode(instruction_table)
+
+    def build_handlers(self):
+        """
+        Build the handler table: op name -> function(operand, next_pc).
+        Each handler returns the index of the next instruction to execute.
+        """
+        stack = self.stack
+        push = stack.append
+        pop = stack.pop
+        memory = self.memory
+        vm = self
+
+        def pushi(operand, pc):
+            push(operand)
+            return pc
+
+        def pushm(operand, pc):
+            push(memory.get(operand, 0))
+            return pc
+
+        def popm(operand, pc):
+            memory[operand] = pop()
+            return pc
+
+        def stdout(operand, pc):
+            vm.stdout.write(f"{pop()}\n")
+            return pc
+
+        def stdin(operand, pc):
+            line = vm.stdin.readline()
+            if not line:
+                raise VMError("Error: STDIN reached end of input")
+            try:
+                value = int(line)
+            except ValueError:
+                raise VMError(f"Error: STDIN expected an integer, got '{line.strip()}'")
+            push(value)
+            return pc
+
+        def add(operand, pc):
+            b = pop()
+            stack[-1] += b
+            return pc
+
+        def sub(operand, pc):
+            b = pop()
+            stack[-1] -= b
+            return pc
+
+        def mul(operand, pc):
+            b = pop()
+            stack[-1] *= b
+            return pc
+
+        def div(operand, pc):
+            b = pop()
+            if b == 0:
+                raise VMError("Error: Division by zero")
+            stack[-1] = int_div(stack[-1], b)
+            return pc
+
+        def grt(operand, pc):
+            b = pop()
+            stack[-1] = 1 if stack[-1] > b else 0
+            return pc
+
+        def les(operand, pc):
+            b = pop()
+            stack[-1] = 1 if stack[-1] < b else 0
+            return pc
+
+        def equ(operand, pc):
+            b = pop()
+            stack[-1] = 1 if stack[-1] == b else 0
+            return pc
+
+        def neq(operand, pc):
+            b = pop()
+            stack[-1] = 1 if stack[-1] != b else 0
+            return pc
+
+        def geq(operand, pc):
+            b = pop()
+            stack[-1] = 1 if stack[-1] >= b else 0
+            return pc
+
+        def leq(operand, pc):
+            b = pop()
+            stack[-1] = 1 if stack[-1] <= b else 0
+            return pc
+
+        def jump(operand, pc):
+            return operand
+
+        def jumpz(operand, pc):
+            return operand if pop() == 0 else pc
+
+        def label(operand, pc):
+            return pc
+
+        # Superinstructions (see superinstructions.py)
+        def incm(operand, pc):
+            address, k = operand
+            memory[address] = memory.get(address, 0) + k
+            return pc
+
+        def addmm(operand, pc):
+            a, b = operand
+            push(memory.get(a, 0) + memory.get(b, 0))
+            return pc
+
+        def submm(operand, pc):
+            a, b = operand
+            push(memory.get(a, 0) - memory.get(b, 0))
+            return pc
+
+        def mulmm(operand, pc):
+            a, b = operand
+            push(memory.get(a, 0) * memory.get(b, 0))
+            return pc
+
+        def divmm(operand, pc):
+            a, b = operand
+            b = memory.get(b, 0)
+            if b == 0:
+                raise VMError("Error: Division by zero")
+            push(int_div(memory.get(a, 0), b))
+            return pc
+
+        def grtjz(operand, pc):
+            b = pop()
+            return pc if pop() > b else operand
+
+        def lesjz(operand, pc):
+            b = pop()
+            return pc if pop() < b else operand
+
+        def equjz(operand, pc):
+            b = pop()
+            return pc if pop() == b else operand
+
+        def neqjz(operand, pc):
+            b = pop()
+            return pc if pop() != b else operand
+
+        def geqjz(operand, pc):
+            b = pop()
+            return pc if pop() >= b else operand
+
+        def leqjz(operand, pc):
+            b = pop()
+            return pc if pop() <= b else operand
+
+        return {
+            'PUSHI': pushi, 'PUSHM': pushm, 'POPM': popm,
+            'STDOUT': stdout, 'STDIN': stdin,
+            'ADD': add, 'SUB': sub, 'MUL': mul, 'DIV': div,
+            'GRT': grt, 'LES': les, 'EQU': equ, 'NEQ': neq, 'GEQ': geq, 'LEQ': leq,
+            'JUMP': jump, 'JUMPZ': jumpz, 'LABEL': label,
+            'INCM': incm, 'ADDMM': addmm, 'SUBMM': submm, 'MULMM': mulmm, 'DIVMM': divmm,
+            'GRTJZ': grtjz, 'LESJZ': lesjz, 'EQUJZ': equjz, 'NEQJZ': neqjz, 'GEQJZ': geqjz, 'LEQJZ': leqjz,
+        }
+
+    def decode(self, instruction_table):
+        """
+        Translate instructions into (handler, operand) pairs.
+        Jump operands (1-based instruction addresses) become list indexes.
+        """
+        code = []
+        count = len(instruction_table)
+        for address, op, operand in instruction_table.rows():
+            handler = self.handlers.get(op)
+            if handler is None:
+                raise VMError(f"Error: Unknown instruction '{op}' at address {address}")
+
+            if op in JUMPS:
+                if operand is None:
+                    raise VMError(f"Error: Unpatched {op} at address {address}")
+                if not 1 <= operand <= count + 1:
+                    raise VMError(f"Error: Jump target {operand} out of range at address {address}")
+                operand -= 1
+            elif op == 'PUSHM' or op == 'POPM':
+                if operand is None or operand < MEMORY_BASE:
+                    raise VMError(f"Error: Bad memory address {operand} at address {address}")
+            elif op in PAIR_OPS:
+                if not isinstance(operand, tuple) or len(operand) != 2:
+                    raise VMError(f"Error: {op} needs two operands at address {address}")
+                if operand[0] < MEMORY_BASE or (op != 'INCM' and operand[1] < MEMORY_BASE):
+                    raise VMError(f"Error: Bad memory address in {operand} at address {address}")
+            code.append((handler, operand))
+        return code
+
+    def count_hits(self, indexes):
+        """
+        Count executions of the instructions at the given 0-based indexes.
+        Only those instructions get a counting handler; the rest of the
+        program runs unchanged. Returns the counts, one per index; an
+        instruction that raises is not counted, matching self.steps.
+        """
+        counts = [0] * len(indexes)
+        for slot, index in enumerate(indexes):
+            handler, operand = self.code[index]
+            self.code[index] = (self.counting(handler, counts, slot), operand)
+        return counts
+
+    @staticmethod
+    def counting(handler, counts, slot):
+        def counted(operand, pc):
+            pc = handler(operand, pc)
+            counts[slot] += 1
+            return pc
+        return counted
+
+    def run(self):
+        """
+        Execute until the program falls off the end.
+        Returns the number of instructions executed.
+        Raises VMError on runtime errors or when max_steps is exceeded.
+        """
+        code = self.code
+        end = len(code)
+        pc = self.pc
+        steps = self.steps
+        limit = self.max_steps if self.max_steps is not None else -1
+
+        try:
+            while pc < end:
+                if steps == limit:
+                    raise VMError(f"Error: Instruction budget of {limit} exceeded")
+                handler, operand = code[pc]
+                pc = handler(operand, pc + 1)
+                steps += 1
+        except IndexError:
+            raise VMError(f"Error: Stack underflow at address {pc + 1}")
+        finally:
+            self.pc = pc
+            self.steps = steps
+
+        return steps